@@ -1,14 +1,69 @@
 import json
 import os
-from datetime import datetime, timedelta
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from near_duplicate import NEAR_DUPLICATE_MIN_JACCARD, is_near_duplicate, minhash_bands
 
 class ArticleManager:
+    """
+    処理済み記事の履歴を SQLite (WALモード) に保存する
+    記事1件のマークは1行の INSERT で済み、照会は主キーのインデックスを使う
+    処理日時は数値のタイムスタンプでも保持し、時刻順インデックスで古い記事を削除する
+    記事タイトルの語の集合も MinHash のバンドのインデックス付きで保存し、類似記事を検索できるようにする
+    """
+
     def __init__(self, storage_file):
+        # storage_file は従来の processed_articles.json のパス
+        # 実際のデータは同じ場所の processed_articles.db に保存する
         self.storage_file = storage_file
-        self.processed_articles = self._load_processed_articles()
+        self.db_file = os.path.splitext(storage_file)[0] + '.db'
+        # パイプラインの各ステージ（別スレッド）から使われるので接続の利用を直列化する
+        self.lock = threading.RLock()
+        self.conn = self._connect()
+        self._migrate_from_json()
+
+    def _connect(self):
+        """データベースに接続し、テーブルを用意する"""
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS processed_articles (
+                article_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                title TEXT,
+                processed_at TEXT NOT NULL,
+                processed_at_ts REAL,
+                duplicate_of TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_processed_at_ts ON processed_articles (processed_at_ts)')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS article_fingerprints (
+                article_id TEXT PRIMARY KEY,
+                features TEXT NOT NULL,
+                source TEXT,
+                processed_at_ts REAL NOT NULL
+            )
+        ''')
+        # MinHash のバンドの値 -> 記事ID（値が一致する記事だけを類似記事の候補として取り出す）
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS article_fingerprint_bands (
+                band INTEGER NOT NULL,
+                article_id TEXT NOT NULL,
+                PRIMARY KEY (band, article_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_fingerprint_ts ON article_fingerprints (processed_at_ts)')
+        conn.commit()
+        return conn
 
     def _load_processed_articles(self):
-        """保存済みの記事IDを読み込む"""
+        """従来のJSON形式の記事履歴を読み込む"""
         if os.path.exists(self.storage_file):
             try:
                 with open(self.storage_file, 'r', encoding='utf-8') as f:
@@ -18,32 +73,133 @@ class ArticleManager:
                 return {}
         return {}
 
-    def _save_processed_articles(self):
-        """処理済み記事IDを保存"""
-        with open(self.storage_file, 'w', encoding='utf-8') as f:
-            json.dump(self.processed_articles, f, ensure_ascii=False, indent=2)
+    def _migrate_from_json(self):
+        """JSONの記事履歴が残っていれば一度だけデータベースへ移行する"""
+        if not os.path.exists(self.storage_file):
+            return
+
+        processed_articles = self._load_processed_articles()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                '''INSERT OR IGNORE INTO processed_articles (article_id, url, title, processed_at, processed_at_ts)
+                   VALUES (?, ?, ?, ?, ?)''',
+                [
+                    (article_id, data.get('url', article_id), data.get('title'),
+                     data['processed_at'], _to_timestamp(data['processed_at']))
+                    for article_id, data in processed_articles.items()
+                ]
+            )
+        # 移行済みのJSONは残しておくが、次回以降は読み込まない
+        os.replace(self.storage_file, self.storage_file + '.migrated')
+        print(f"記事履歴をJSONからデータベースへ移行しました: {len(processed_articles)} 件")
 
     def is_article_processed(self, article_id, article_url):
         """記事が既に処理済みかチェック"""
-        return article_id in self.processed_articles
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM processed_articles WHERE article_id = ?', (article_id,)
+            ).fetchone()
+        return row is not None
 
     def mark_article_as_processed(self, article_id, article_url, title):
         """記事を処理済みとしてマーク"""
-        self.processed_articles[article_id] = {
-            'url': article_url,
-            'title': title,
-            'processed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        self._save_processed_articles()
+        self.mark_articles_as_processed([(article_id, article_url, title)])
+
+    def mark_articles_as_processed(self, articles):
+        """(article_id, article_url, title) のリストをまとめて処理済みとしてマーク"""
+        now = time.time()
+        processed_at = datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock, self.conn:
+            self.conn.executemany(
+                '''INSERT OR REPLACE INTO processed_articles (article_id, url, title, processed_at, processed_at_ts)
+                   VALUES (?, ?, ?, ?, ?)''',
+                [(article_id, article_url, title, processed_at, now) for article_id, article_url, title in articles]
+            )
+
+    def mark_duplicates(self, duplicates):
+        """
+        (article_id, article_url, title, duplicate_of) のリストを
+        既存記事の重複として処理済みにマーク（要約・書き込みは行わない）
+        """
+        now = time.time()
+        processed_at = datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock, self.conn:
+            self.conn.executemany(
+                '''INSERT OR REPLACE INTO processed_articles
+                   (article_id, url, title, processed_at, processed_at_ts, duplicate_of)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                [
+                    (article_id, article_url, title, processed_at, now, duplicate_of)
+                    for article_id, article_url, title, duplicate_of in duplicates
+                ]
+            )
+
+    def add_fingerprints(self, fingerprints):
+        """(article_id, article_fingerprint の戻り値) のリストを類似記事インデックスに追加"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO article_fingerprints VALUES (?, ?, ?, ?)',
+                [
+                    (article_id, json.dumps(list(features), ensure_ascii=False), source, now)
+                    for article_id, (features, source) in fingerprints
+                ]
+            )
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO article_fingerprint_bands VALUES (?, ?)',
+                [
+                    (band, article_id)
+                    for article_id, (features, _) in fingerprints
+                    for band in minhash_bands(features)
+                ]
+            )
+
+    def find_near_duplicate(self, fingerprint, min_jaccard=NEAR_DUPLICATE_MIN_JACCARD):
+        """
+        別のフィードの類似記事のうち最も古いもののIDを返す（なければ None）
+        MinHash のバンドが一致する候補だけをインデックスで取り出して確認する
+        """
+        bands = minhash_bands(fingerprint[0])
+        if not bands:
+            return None
+        placeholders = ', '.join('?' * len(bands))
+        with self.lock:
+            rows = self.conn.execute(
+                f'''SELECT article_id, features, source FROM article_fingerprints
+                    WHERE article_id IN (SELECT article_id FROM article_fingerprint_bands WHERE band IN ({placeholders}))
+                    ORDER BY processed_at_ts''',
+                bands
+            ).fetchall()
+        for article_id, features, source in rows:
+            if is_near_duplicate((json.loads(features), source), fingerprint, min_jaccard):
+                return article_id
+        return None
 
     def cleanup_old_entries(self, days=30):
-        """30日以上前の記事を履歴から削除"""
-        cutoff_date = datetime.now() - timedelta(days=days)
-        current_entries = self.processed_articles.copy()
-        
-        for article_id, data in current_entries.items():
-            processed_at = datetime.strptime(data['processed_at'], '%Y-%m-%d %H:%M:%S')
-            if processed_at < cutoff_date:
-                del self.processed_articles[article_id]
-        
-        self._save_processed_articles()
\ No newline at end of file
+        """
+        30日以上前の記事を履歴から削除
+        時刻順インデックスの先頭（期限切れの範囲）だけを走査し、
+        期限切れの記事がなければ書き込みを行わない
+        """
+        cutoff_ts = time.time() - days * 86400
+        with self.lock:
+            oldest_ts = self.conn.execute('SELECT MIN(processed_at_ts) FROM processed_articles').fetchone()[0]
+        if oldest_ts is None or oldest_ts >= cutoff_ts:
+            return 0
+
+        with self.lock, self.conn:
+            cursor = self.conn.execute('DELETE FROM processed_articles WHERE processed_at_ts < ?', (cutoff_ts,))
+            self.conn.execute(
+                '''DELETE FROM article_fingerprint_bands WHERE article_id IN
+                   (SELECT article_id FROM article_fingerprints WHERE processed_at_ts < ?)''',
+                (cutoff_ts,)
+            )
+            self.conn.execute('DELETE FROM article_fingerprints WHERE processed_at_ts < ?', (cutoff_ts,))
+        return cursor.rowcount
+
+    def close(self):
+        self.conn.close()
+
+def _to_timestamp(processed_at):
+    """'%Y-%m-%d %H:%M:%S' 形式の日時文字列をUNIXタイムスタンプに変換"""
+    return datetime.strptime(processed_at, '%Y-%m-%d %H:%M:%S').timestamp()
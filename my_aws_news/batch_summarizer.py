@@ -0,0 +1,103 @@
+import json
+import os
+from datetime import datetime
+
+from summarizer import SUMMARY_MODEL, SUMMARY_PROMPT, build_summary_messages, get_openai_client
+
+# バッチジョブが終了したとみなすステータス
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# バッチAPIの呼び出しは llm_call を通さないので、SDK の再試行を使う（共有クライアントは再試行しない）
+BATCH_API_MAX_RETRIES = 2
+
+def get_batch_client():
+    return get_openai_client().with_options(max_retries=BATCH_API_MAX_RETRIES)
+
+def load_batch_state(state_file):
+    """実行中のバッチジョブの状態を読み込む（なければ None）"""
+    if not os.path.exists(state_file):
+        return None
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print("バッチ状態ファイルが破損しています。破棄します。")
+        return None
+
+def save_batch_state(state_file, state):
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, state_file)
+
+def clear_batch_state(state_file):
+    if os.path.exists(state_file):
+        os.remove(state_file)
+
+def build_batch_input(articles):
+    """記事ごとの chat.completions リクエストを JSONL にまとめる"""
+    lines = []
+    for index, article in enumerate(articles):
+        request = {
+            "custom_id": f"article-{index}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": SUMMARY_MODEL,
+                "messages": build_summary_messages(article['summary'], article['title']),
+            },
+        }
+        lines.append(json.dumps(request, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+def submit_batch(articles, state_file, client=None):
+    """要約待ちの記事を1つのバッチジョブとして投入し、状態を保存する"""
+    client = client or get_batch_client()
+    input_file = client.files.create(
+        file=(f"aws_news_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl", build_batch_input(articles)),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    state = {
+        'batch_id': batch.id,
+        'input_file_id': input_file.id,
+        'submitted_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'articles': articles,
+    }
+    save_batch_state(state_file, state)
+    print(f"バッチジョブを投入しました: {batch.id} ({len(articles)} 件)")
+    return state
+
+def collect_batch(state, client=None, cache=None):
+    """
+    バッチジョブの結果を取得する
+    戻り値は (status, summaries)。summaries は記事の順序に並んだ要約のリストで、
+    ジョブが終了していなければ None
+    要約に失敗した記事は None になる
+    """
+    client = client or get_batch_client()
+    batch = client.batches.retrieve(state['batch_id'])
+    if batch.status not in BATCH_FINAL_STATUSES:
+        return batch.status, None
+
+    summaries = [None] * len(state['articles'])
+    if batch.status == "completed" and batch.output_file_id:
+        output = client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            index = int(result['custom_id'].split('-', 1)[1])
+            response = result.get('response') or {}
+            if response.get('status_code') != 200:
+                continue
+            summaries[index] = response['body']['choices'][0]['message']['content']
+
+    if cache:
+        for article, summary in zip(state['articles'], summaries):
+            if summary:
+                cache.put(SUMMARY_MODEL, SUMMARY_PROMPT, article['summary'], summary)
+    return batch.status, summaries
@@ -0,0 +1,48 @@
+"""
+同期要約モードとバッチAPIモードのベンチマーク
+ローカル代替サーバー（local_openai_server.py）を起動し、ネットワークなしで全体の処理を実行する
+
+使い方: python bench_batch_mode.py [記事数] [1件あたりの遅延秒]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from local_openai_server import start_server
+
+def run(label, batch_mode, output_dir, runs=1):
+    import main
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        # 出力・状態ファイル・キャッシュ・検索インデックスはすべて一時ディレクトリに置く
+        main.main(batch_mode=batch_mode, output_dir=output_dir)
+    return label, time.perf_counter() - start
+
+def main():
+    entry_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    server = start_server(port=0, latency=latency)
+    host, port = server.server_address
+    os.environ["OPENAI_BASE_URL"] = f"http://{host}:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "dummy")
+    os.environ["AWS_NEWS_RSS"] = f"http://{host}:{port}/feed.xml?n={entry_count}&seed=whatsnew"
+    os.environ["DEVELOPERS_IO_RSS"] = f"http://{host}:{port}/feed.xml?n={entry_count}&seed=devio"
+    os.environ["AWS_ML_BLOG_RSS"] = f"http://{host}:{port}/feed.xml?n={entry_count}&seed=ml"
+    os.environ["AWS_JP_BLOG_RSS"] = f"http://{host}:{port}/feed.xml?n={entry_count}&seed=jp"
+
+    results = []
+    with tempfile.TemporaryDirectory() as sync_dir, tempfile.TemporaryDirectory() as batch_dir:
+        results.append(run("同期要約", False, sync_dir))
+        # バッチモードは投入と回収の2回の実行で完了する
+        results.append(run("バッチAPI (投入+回収)", True, batch_dir, runs=2))
+
+    print(f"\n記事数: {entry_count * 4}  要約1件あたりの遅延: {latency} 秒")
+    for label, elapsed in results:
+        print(f"{label:<24}: {elapsed:.2f} 秒")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+起動時のモジュール読み込み時間のベンチマーク（python -X importtime を使用）
+
+my_aws_news/main.py と test-podcast/main_updated.py について、
+現在の読み込み時間と、重いモジュール（openai / openpyxl / feedparser / requests / bs4）を
+従来どおり先頭で読み込んだ場合の時間を比較する
+
+使い方: python bench_import_time.py [繰り返し回数]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ["openai", "openpyxl", "feedparser", "requests", "bs4"]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TARGETS = [
+    ("my_aws_news/main.py", BASE_DIR, "main"),
+    ("test-podcast/main_updated.py", os.path.join(os.path.dirname(BASE_DIR), "test-podcast"), "main_updated"),
+]
+
+def import_time(project_dir, statement, work_dir):
+    """
+    python -X importtime で statement を実行し、
+    (合計の読み込み時間[ms], {トップレベルモジュール: 累積時間[ms]}) を返す
+    """
+    env = dict(os.environ, PYTHONPATH=project_dir, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=work_dir, env=env, capture_output=True, text=True, check=True,
+    )
+    total = 0
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # 形式: "import time:   自身[us] |   累積[us] | (ネストの深さ分インデントされた)モジュール名"
+        self_part, cumulative_part, name_part = line.split("|")
+        self_us = int(self_part.split(":")[1])
+        # インデントが最小（空白1つ）の行がトップレベルの import
+        if not name_part[1:].startswith(" "):
+            top_level[name_part.strip()] = int(cumulative_part) / 1000
+        total += self_us / 1000
+    return total, top_level
+
+def measure(project_dir, statement, repeat, work_dir):
+    totals = []
+    top_level = {}
+    for _ in range(repeat):
+        total, top_level = import_time(project_dir, statement, work_dir)
+        totals.append(total)
+    return statistics.median(totals), top_level
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"繰り返し回数: {repeat}（中央値を表示）\n")
+
+    # test-podcast はログファイルをカレントディレクトリに作るので一時ディレクトリで実行する
+    with tempfile.TemporaryDirectory() as work_dir:
+        for label, project_dir, module in TARGETS:
+            # 1回目は .pyc の作成などが入るので捨てる
+            import_time(project_dir, f"import {module}", work_dir)
+
+            lazy_ms, top_level = measure(project_dir, f"import {module}", repeat, work_dir)
+            eager_ms, _ = measure(project_dir, f"import {', '.join(HEAVY_MODULES)}; import {module}", repeat, work_dir)
+            loaded = [name for name in HEAVY_MODULES if name in top_level]
+
+            print(f"[{label}]")
+            print(f"  遅延読み込み（現在）      : {lazy_ms:8.1f} ms")
+            print(f"  重いモジュールを先に読込 : {eager_ms:8.1f} ms")
+            print(f"  短縮                      : {eager_ms - lazy_ms:8.1f} ms ({eager_ms / lazy_ms:.1f}倍)")
+            print(f"  起動時に読み込まれる重いモジュール: {', '.join(loaded) or 'なし'}")
+            slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:5]
+            print("  読み込みに時間がかかるモジュール: " + ", ".join(f"{name} {ms:.1f}ms" for name, ms in slowest))
+            print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+類似記事判定の調整用スクリプト
+同じ発表を扱った別フィードの記事タイトルの組（正例）と、それ以外の全ての組（負例）で
+従来の判定（タイトルの文字3-gramの SimHash 距離3以下 + Jaccard 0.8以上）と
+near_duplicate の判定の適合率・再現率、LSH の候補の取りこぼしを比べる
+
+使い方: python bench_near_duplicate.py [記事タイトルのJSONLファイル]
+JSONL は1行に {"group": 発表ごとのID, "title": タイトル} を書く（同じ group の記事が同じ発表）
+省略した場合は What's New（日本語）・AWS ブログ・DevelopersIO の見出しの書き方を真似た組を使う
+"""
+import hashlib
+import json
+import re
+import sys
+import time
+import unicodedata
+from itertools import combinations
+
+from near_duplicate import (
+    NEAR_DUPLICATE_MIN_JACCARD, ascii_words, is_near_duplicate, jaccard, minhash_bands, numbered_words, title_features,
+)
+
+# 同じ発表の記事をまとめたもの（1件だけのグループは、他のグループと紛らわしい別の発表）
+SAMPLE_GROUPS = [
+    ["Amazon S3 が汎用バケットの上限を 100 万に引き上げ",
+     "[アップデート] Amazon S3 の汎用バケットの上限が 100 万に引き上げられました"],
+    ["Amazon S3 がディレクトリバケットの上限を引き上げ"],
+    ["Amazon Bedrock で Meta Llama 3.2 モデルが利用可能に",
+     "[アップデート] Amazon Bedrock で Llama 3.2 モデルが使えるようになりました"],
+    ["Amazon Bedrock で Meta Llama 3.3 70B モデルが利用可能に"],
+    ["AWS Lambda が Python 3.13 をサポート",
+     "[アップデート] AWS Lambda で Python 3.13 ランタイムがサポートされました"],
+    ["AWS Lambda が Node.js 22 をサポート",
+     "AWS Lambda now supports Node.js 22"],
+    ["Amazon RDS for PostgreSQL がマイナーバージョン 16.4、15.8 をサポート",
+     "Amazon RDS for PostgreSQL マイナーバージョン 16.4 と 15.8 のサポートを開始"],
+    ["Amazon RDS for PostgreSQL がマイナーバージョン 16.5、15.9 をサポート"],
+    ["Amazon RDS for PostgreSQL が pgvector 0.8.0 をサポート"],
+    ["Amazon EC2 C7i インスタンスが大阪リージョンで利用可能に",
+     "Amazon EC2 C7i インスタンスが大阪リージョンで利用可能になりました"],
+    ["Amazon EC2 M7i インスタンスが大阪リージョンで利用可能に"],
+    ["Amazon EC2 C7i インスタンスがジャカルタリージョンで利用可能に"],
+    ["Amazon EC2 C7i-flex インスタンスが大阪リージョンで利用可能に"],
+    ["Amazon CloudWatch Logs がログの異常検出をサポート",
+     "[新機能] CloudWatch Logs でログの異常検出ができるようになりました"],
+    ["Amazon CloudWatch Logs がフィールドインデックスをサポート"],
+    ["AWS Step Functions が変数と JSONata をサポート",
+     "[アップデート] AWS Step Functions で変数と JSONata が使えるようになりました"],
+    ["AWS Step Functions の Distributed Map が子ワークフローの上限を引き上げ"],
+    ["Amazon ECS がタスクへの Amazon EBS ボリュームのアタッチをサポート",
+     "[アップデート] Amazon ECS でタスクに EBS ボリュームをアタッチできるようになりました"],
+    ["[アップデート] Amazon ECS でサービスのアベイラビリティーゾーン再調整がサポートされました"],
+    ["Amazon Aurora Serverless v2 が 0 ACU へのスケールをサポート",
+     "[アップデート] Aurora Serverless v2 が 0 ACU までスケールダウンできるようになりました"],
+    ["Amazon Aurora が PostgreSQL 16.6 をサポート"],
+    ["AWS CloudFormation が IaC ジェネレーターを発表",
+     "[新機能] CloudFormation の IaC ジェネレーターで既存リソースからテンプレートを作成してみた"],
+    ["Amazon DynamoDB がリソースベースのポリシーをサポート",
+     "[アップデート] DynamoDB でリソースベースポリシーがサポートされました"],
+    ["Amazon DynamoDB がウォームスループットをサポート"],
+    ["Amazon VPC Lattice が TCP をサポート",
+     "[アップデート] VPC Lattice で TCP がサポートされました"],
+    ["Amazon VPC Lattice が Amazon ECS をサポート"],
+    ["AWS Lambda コンソールのコードエディタを刷新",
+     "[アップデート] Lambda コンソールのコードエディタが刷新されました"],
+    ["Amazon EventBridge がイベントバスの暗号化にカスタマーマネージドキーをサポート",
+     "[アップデート] EventBridge のイベントバスでカスタマーマネージドキーによる暗号化がサポートされました"],
+    ["Amazon SQS がカスタマーマネージドキーによる暗号化をサポート"],
+    ["AWS IAM Identity Center が IPv6 をサポート",
+     "IAM Identity Center が IPv6 に対応しました"],
+    ["AWS IAM Identity Center が複数リージョンへのレプリケーションをサポート"],
+    ["Amazon Route 53 Resolver DNS Firewall が高度な脅威防御をサポート",
+     "[アップデート] Route 53 Resolver DNS Firewall で高度な脅威防御が利用できるようになりました"],
+    ["Amazon Route 53 が HTTPS レコードをサポート"],
+    ["Amazon S3 Express One Zone が追加のリージョンで利用可能に",
+     "S3 Express One Zone の利用可能リージョンが追加されました"],
+    ["Amazon S3 Express One Zone がデータの追記をサポート"],
+    ["Amazon OpenSearch Serverless がベクトルエンジンのバイナリ量子化をサポート",
+     "[アップデート] OpenSearch Serverless のベクトルエンジンでバイナリ量子化がサポートされました"],
+    ["Amazon OpenSearch Service がベクトルエンジンのバイナリ量子化をサポート"],
+    ["AWS Systems Manager が新しい統合コンソールを発表",
+     "AWS Systems Manager の新しい統合コンソールのご紹介"],
+    ["AWS Systems Manager Session Manager がポートフォワーディングのログ記録をサポート"],
+    ["Amazon EKS が Kubernetes 1.31 をサポート",
+     "[アップデート] Amazon EKS で Kubernetes 1.31 がサポートされました",
+     "Amazon EKS now supports Kubernetes version 1.31"],
+    ["Amazon EKS が Kubernetes 1.32 をサポート",
+     "Amazon EKS now supports Kubernetes version 1.32"],
+    ["Amazon Q Developer がコードレビュー機能を提供開始",
+     "[新機能] Amazon Q Developer のコードレビュー機能を試してみた"],
+    ["Amazon Q Developer がドキュメント生成機能を提供開始"],
+    ["Amazon CloudFront が VPC オリジンをサポート",
+     "[アップデート] CloudFront で VPC オリジンが使えるようになりました"],
+    ["Amazon CloudFront が gRPC をサポート"],
+    ["AWS Backup が Amazon EKS のバックアップをサポート",
+     "[アップデート] AWS Backup で EKS クラスターをバックアップできるようになりました"],
+    ["AWS Backup が Amazon Timestream のバックアップをサポート"],
+    ["Amazon Bedrock Knowledge Bases が GraphRAG をサポート",
+     "Amazon Bedrock Knowledge Bases で GraphRAG のサポートを開始"],
+    ["Amazon Bedrock Knowledge Bases が構造化データの取得をサポート"],
+    ["Amazon RDS for MySQL がマイナーバージョン 8.0.40 をサポート",
+     "Amazon RDS for MySQL マイナーバージョン 8.0.40 のサポートを開始"],
+    ["Amazon RDS for MariaDB がマイナーバージョン 10.11.10 をサポート"],
+    ["AWS Lambda now supports SnapStart for Python and .NET functions",
+     "AWS Lambda SnapStart for Python and .NET functions is now generally available"],
+    ["Amazon EC2 Trn2 instances are now generally available",
+     "Announcing the general availability of Amazon EC2 Trn2 instances"],
+    ["Amazon EC2 P5en instances are now generally available"],
+    ["Amazon SageMaker Unified Studio (preview)",
+     "Introducing Amazon SageMaker Unified Studio in preview"],
+    ["週刊AWS – 2024/11/18週"],
+    ["週刊AWS – 2024/11/25週"],
+]
+
+SHINGLE_SIZE = 3
+VERSION_PATTERN = re.compile(r'\d+(?:\.\d+)+')
+
+def original_text(title):
+    text = re.sub(r'<[^>]+>', ' ', title)
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return re.sub(r'\s+', ' ', text).strip()
+
+def original_shingles(text):
+    if len(text) < SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def original_simhash(text):
+    weights = [0] * 64
+    for shingle in original_shingles(text):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+def original_is_near_duplicate(a, b):
+    """従来の判定（概要のない最も有利な条件として、タイトルだけで比べる）"""
+    a, b = original_text(a), original_text(b)
+    if bin(original_simhash(a) ^ original_simhash(b)).count('1') > 3:
+        return False
+    if set(VERSION_PATTERN.findall(a)) != set(VERSION_PATTERN.findall(b)):
+        return False
+    shingles_a, shingles_b = original_shingles(a), original_shingles(b)
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b) >= 0.8
+
+def load_groups(path):
+    groups = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                groups.setdefault(record['group'], []).append(record['title'])
+    return list(groups.values())
+
+def labelled_pairs(groups):
+    """(タイトル, タイトル, 同じ発表かどうか) のリスト"""
+    titles = [(group_id, title) for group_id, group in enumerate(groups) for title in group]
+    return [(a, b, group_a == group_b) for (group_a, a), (group_b, b) in combinations(titles, 2)]
+
+def score(pairs, predict):
+    true_positive = sum(1 for a, b, same in pairs if same and predict(a, b))
+    false_positive = sum(1 for a, b, same in pairs if not same and predict(a, b))
+    positives = sum(1 for _, _, same in pairs if same)
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 1.0
+    recall = true_positive / positives if positives else 1.0
+    return precision, recall, false_positive
+
+def main():
+    if len(sys.argv) > 1:
+        groups, source = load_groups(sys.argv[1]), sys.argv[1]
+    else:
+        groups, source = SAMPLE_GROUPS, "見出しの書き方を真似た組"
+    pairs = labelled_pairs(groups)
+    positives = sum(1 for _, _, same in pairs if same)
+    print(f"記事: {sum(map(len, groups))} 件 ({source})  組: {len(pairs)} (正例 {positives})")
+
+    def report(name, predict):
+        precision, recall, false_positive = score(pairs, predict)
+        print(f"{name:<28}: 適合率 {precision:.2f}  再現率 {recall:.2f}  誤検出 {false_positive}")
+
+    report("従来の判定", original_is_near_duplicate)
+
+    # 出典は常に別のフィードとして比べる
+    fingerprints = {title: (sorted(title_features(title)), title) for group in groups for title in group}
+    def predict(a, b, min_jaccard=NEAR_DUPLICATE_MIN_JACCARD):
+        return is_near_duplicate(fingerprints[a], fingerprints[b], min_jaccard)
+
+    for min_jaccard in (0.3, 0.4, 0.5, 0.6, 0.7):
+        marker = " (既定値)" if min_jaccard == NEAR_DUPLICATE_MIN_JACCARD else ""
+        report(f"Jaccard {min_jaccard:.1f} 以上{marker}", lambda a, b: predict(a, b, min_jaccard))
+
+    # 確認を1つずつ外した場合
+    features = {title: set(fingerprint[0]) for title, fingerprint in fingerprints.items()}
+    def similar(a, b):
+        return jaccard(features[a], features[b]) >= NEAR_DUPLICATE_MIN_JACCARD
+    def same_numbers(a, b):
+        return numbered_words(features[a]) == numbered_words(features[b])
+    def nested_words(a, b):
+        words_a, words_b = ascii_words(features[a]), ascii_words(features[b])
+        return words_a <= words_b or words_b <= words_a
+    report("数字を含む語の確認なし", lambda a, b: similar(a, b) and nested_words(a, b))
+    report("英数字の語の確認なし", lambda a, b: similar(a, b) and same_numbers(a, b))
+
+    # LSH のバンドが一致して候補に上がる組
+    start = time.perf_counter()
+    bands = {title: set(minhash_bands(fingerprint[0])) for title, fingerprint in fingerprints.items()}
+    elapsed = (time.perf_counter() - start) / len(fingerprints)
+    matched = [(a, b) for a, b, same in pairs if same and predict(a, b)]
+    found = sum(1 for a, b in matched if bands[a] & bands[b])
+    others = sum(1 for a, b, same in pairs if not same and bands[a] & bands[b])
+    print(f"LSH の候補: 判定で一致する正例 {found}/{len(matched)}  負例 {others}/{len(pairs) - positives}"
+          f"  計算 {elapsed * 1e6:.0f} µs/件")
+
+    for a, b, same in pairs:
+        if same != predict(a, b):
+            label = "見逃し" if same else "誤検出"
+            print(f"  {label}: {a} / {b}  (Jaccard {jaccard(features[a], features[b]):.2f})")
+
+if __name__ == "__main__":
+    main()
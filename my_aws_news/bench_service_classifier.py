@@ -0,0 +1,83 @@
+"""
+サービス名検出のベンチマーク
+従来の線形走査（service in title）と Aho-Corasick オートマトンを比較する
+
+使い方: python bench_service_classifier.py [サービス数] [タイトル数]
+"""
+import os
+import random
+import sys
+import time
+
+from service_classifier import ServiceMatcher, load_service_list, _catalog_cache_path
+
+def linear_find(services, title):
+    """従来の実装（リスト順で最初に一致したサービスを返す）"""
+    for service in services:
+        if service in title:
+            return service
+    return "Other"
+
+def build_services(base_services, count, rng):
+    """実際のサービス名に架空の派生名を加えて count 件にする"""
+    services = list(base_services)
+    suffixes = ["Auto Scaling", "Serverless", "Insights", "Connector", "Studio", "Gateway", "Express", "Edge"]
+    while len(services) < count:
+        base = rng.choice(base_services)
+        services.append(f"{base} {rng.choice(suffixes)} {len(services)}")
+    return services[:count]
+
+def build_titles(services, count, rng):
+    """サービス名を含むタイトルと含まないタイトルを混ぜて作る"""
+    titles = []
+    for i in range(count):
+        if i % 4 == 0:
+            titles.append(f"週刊AWSアップデートまとめ 第{i}号: 新機能のご紹介")
+        else:
+            titles.append(f"{rng.choice(services)} が東京リージョンで利用可能になりました")
+    return titles
+
+def timeit(func, titles):
+    start = time.perf_counter()
+    for title in titles:
+        func(title)
+    return time.perf_counter() - start
+
+def main():
+    service_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    title_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(0)
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    base_services = list(load_service_list(os.path.join(current_dir, "service_list.txt")))
+    services = build_services(base_services, service_count, rng)
+    titles = build_titles(services, title_count, rng)
+
+    start = time.perf_counter()
+    matcher = ServiceMatcher(services)
+    build_time = time.perf_counter() - start
+
+    linear_time = timeit(lambda title: linear_find(services, title), titles)
+    automaton_time = timeit(matcher.find_longest, titles)
+
+    print(f"サービス数: {len(services)}  タイトル数: {len(titles)}")
+    print(f"オートマトン構築: {build_time * 1000:.1f} ms")
+    print(f"線形走査        : {linear_time * 1000:.1f} ms ({linear_time / len(titles) * 1e6:.1f} us/件)")
+    print(f"Aho-Corasick    : {automaton_time * 1000:.1f} ms ({automaton_time / len(titles) * 1e6:.1f} us/件)")
+    print(f"高速化          : {linear_time / automaton_time:.1f} 倍")
+
+    # サービスリストの読み込み（コンパイル済みカタログなし / あり）
+    list_path = os.path.join(current_dir, "service_list.txt")
+    cache_path = _catalog_cache_path(list_path)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    start = time.perf_counter()
+    load_service_list(list_path)
+    cold_time = time.perf_counter() - start
+    start = time.perf_counter()
+    load_service_list(list_path)
+    warm_time = time.perf_counter() - start
+    print(f"リスト読み込み  : コンパイル {cold_time * 1000:.2f} ms / キャッシュ {warm_time * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
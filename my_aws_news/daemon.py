@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import shared  # noqa: F401  news_common を読み込めるようにする
+from news_common.llm_call import get_llm_caller
+
+# フィードごとのポーリング間隔（秒）の初期値・下限・上限
+DAEMON_INITIAL_INTERVAL = float(os.getenv("DAEMON_INITIAL_INTERVAL", "1800"))
+DAEMON_MIN_INTERVAL = float(os.getenv("DAEMON_MIN_INTERVAL", "300"))
+DAEMON_MAX_INTERVAL = float(os.getenv("DAEMON_MAX_INTERVAL", "21600"))
+
+# ヘルスチェック・メトリクス用のHTTPエンドポイント（ポートを0にすると無効）
+DAEMON_METRICS_HOST = os.getenv("DAEMON_METRICS_HOST", "127.0.0.1")
+DAEMON_METRICS_PORT = int(os.getenv("DAEMON_METRICS_PORT", "8790"))
+
+# 前回の取得で見えたエントリーIDを覚えておく件数（フィードあたり）
+SEEN_ENTRY_LIMIT = 500
+
+class FeedSchedule:
+    """
+    フィードごとのポーリング間隔を、実際に新着があった頻度に合わせて調整するスケジュール
+    新着があれば間隔を半分に、なければ1.5倍に、取得に失敗したら2倍にする
+    状態は state_file に保存するので、再起動しても学習した間隔を引き継ぐ
+    """
+
+    def __init__(self, feed_urls, state_file, initial_interval=DAEMON_INITIAL_INTERVAL,
+                 min_interval=DAEMON_MIN_INTERVAL, max_interval=DAEMON_MAX_INTERVAL,
+                 intervals=None, resume=False):
+        """
+        intervals はフィードごとの初期間隔（OPMLで指定されたものなど）
+        resume=True なら保存済みの次回ポーリング時刻を引き継ぐ（定期起動されるワーカー用）
+        """
+        self.state_file = state_file
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lock = threading.Lock()
+
+        saved = self._load()
+        now = time.time()
+        self.feeds = {}
+        intervals = intervals or {}
+        for feed_url in feed_urls:
+            feed = saved.get(feed_url, {})
+            interval = feed.get('interval', intervals.get(feed_url) or initial_interval)
+            self.feeds[feed_url] = {
+                'interval': min(max(interval, min_interval), max_interval),
+                # 通常は起動直後に全フィードを一度取得する
+                'next_poll': feed.get('next_poll', now) if resume else now,
+                'last_poll': feed.get('last_poll'),
+                'last_new_at': feed.get('last_new_at'),
+                'polls': feed.get('polls', 0),
+                'new_items': feed.get('new_items', 0),
+                'failures': feed.get('failures', 0),
+                'seen_ids': feed.get('seen_ids', []),
+            }
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"ポーリング状態の読み込みに失敗しました。初期値から始めます: {e}")
+            return {}
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.feeds, ensure_ascii=False, indent=2)
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.state_file)
+
+    def due_feeds(self, now=None):
+        """ポーリング時刻になったフィードのURLを返す"""
+        now = time.time() if now is None else now
+        with self.lock:
+            return [url for url, feed in self.feeds.items() if feed['next_poll'] <= now]
+
+    def seconds_until_next(self, now=None):
+        """次のポーリングまでの秒数（フィードがなければ最大の間隔）"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if not self.feeds:
+                return self.max_interval
+            return max(0.0, min(feed['next_poll'] for feed in self.feeds.values()) - now)
+
+    def record_poll(self, feed_url, feed):
+        """
+        取得結果を記録して次のポーリング時刻を決め、新着エントリー数を返す
+        新着は前回の取得で見えなかったエントリーIDの数で数える
+        """
+        now = time.time()
+        with self.lock:
+            state = self.feeds[feed_url]
+            state['polls'] += 1
+            state['last_poll'] = now
+            if feed is None:
+                state['failures'] += 1
+                state['interval'] = min(state['interval'] * 2, self.max_interval)
+                state['next_poll'] = now + state['interval']
+                return 0
+
+            entry_ids = [entry.get('id') or entry.get('link') for entry in feed.entries]
+            previous_ids = set(state['seen_ids'])
+            # 初回の取得は基準を作るだけにする（新着の有無が分からないので間隔も変えない）
+            baseline = not previous_ids and bool(entry_ids)
+            new_count = 0 if baseline else len([i for i in entry_ids if i not in previous_ids])
+            state['seen_ids'] = entry_ids[:SEEN_ENTRY_LIMIT]
+            state['failures'] = 0
+
+            if new_count:
+                state['new_items'] += new_count
+                state['last_new_at'] = now
+                state['interval'] = max(state['interval'] / 2, self.min_interval)
+            elif not baseline:
+                state['interval'] = min(state['interval'] * 1.5, self.max_interval)
+            state['next_poll'] = now + state['interval']
+            return new_count
+
+    def snapshot(self):
+        """メトリクス用にフィードごとの状態を返す（既読IDは除く）"""
+        with self.lock:
+            return {
+                url: {key: value for key, value in feed.items() if key != 'seen_ids'}
+                for url, feed in self.feeds.items()
+            }
+
+class DaemonMetrics:
+    """デーモンの稼働状況をまとめるカウンター"""
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self.cycles = 0
+        self.articles_total = 0
+        self.saved_total = 0
+        self.errors_total = 0
+        self.last_cycle_at = None
+        self.last_cycle_seconds = None
+        self.last_error = None
+
+    def record_cycle(self, started_at, article_count, saved_count):
+        with self.lock:
+            self.cycles += 1
+            self.articles_total += article_count
+            self.saved_total += saved_count
+            self.last_cycle_at = started_at
+            self.last_cycle_seconds = round(time.time() - started_at, 3)
+
+    def record_error(self, error):
+        with self.lock:
+            self.errors_total += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def as_dict(self):
+        with self.lock:
+            data = {
+                'status': 'ok',
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'cycles': self.cycles,
+                'articles_total': self.articles_total,
+                'saved_total': self.saved_total,
+                'errors_total': self.errors_total,
+                'last_cycle_at': self.last_cycle_at,
+                'last_cycle_seconds': self.last_cycle_seconds,
+                'last_error': self.last_error,
+            }
+        data['feeds'] = self.schedule.snapshot()
+        data['llm'] = get_llm_caller().metrics()
+        return data
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /health は生存確認、GET /metrics は稼働状況をJSONで返す"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/health":
+            body, status = b'{"status": "ok"}', 200
+        elif self.path == "/metrics":
+            body, status = json.dumps(self.server.metrics.as_dict(), ensure_ascii=False).encode('utf-8'), 200
+        else:
+            body, status = b'{"error": "not found"}', 404
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_metrics_server(metrics, host=DAEMON_METRICS_HOST, port=DAEMON_METRICS_PORT):
+    """バックグラウンドスレッドでメトリクスサーバーを起動する（port が 0 なら起動しない）"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"メトリクスエンドポイント: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,216 @@
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from sinks import LINK_COLUMN, ROW_HEADERS, RowSink, SqliteSink, new_rows, read_csv_rows
+
+MANIFEST_FILE = "manifest.json"
+
+def shard_month(date):
+    """行の日付 (YYYY-MM-DD) から保存先の月 (YYYY-MM) を決める"""
+    try:
+        return datetime.strptime(str(date)[:10], "%Y-%m-%d").strftime("%Y-%m")
+    except ValueError:
+        return datetime.now().strftime("%Y-%m")
+
+def load_manifest(service_dir, service_name):
+    """サービスの月別ファイル一覧 (manifest.json) を読み込む"""
+    path = os.path.join(service_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            print(f"マニフェストが破損しています。作り直します: {path}")
+    return {"service": service_name, "shards": {}}
+
+def save_manifest(service_dir, manifest):
+    path = os.path.join(service_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def create_or_get_excel(base_dir, service_name, month):
+    """サービスの月別Excelファイル ({service}_{YYYY-MM}.xlsx) を作成または取得"""
+    service_dir = os.path.join(base_dir, service_name)
+    os.makedirs(service_dir, exist_ok=True)
+
+    excel_path = os.path.join(service_dir, f"{service_name}_{month}.xlsx")
+
+    if os.path.exists(excel_path):
+        wb = load_workbook(excel_path)
+    else:
+        wb = Workbook()
+        ws = wb.active
+        ws.append(ROW_HEADERS)
+        for cell in ws[1]:
+            cell.font = Font(bold=True)
+
+    return wb, excel_path
+
+def add_entry_to_excel(wb, date, title, summary, link):
+    """Excelに新しいエントリーを追加"""
+    ws = wb.active
+    ws.append([date, title, summary, link])
+
+class ExcelSink(RowSink):
+    """
+    {service}/{service}_{YYYY-MM}.xlsx に月別に追記する
+    書き込みは当月の小さなファイルだけで済み、ファイル一覧は manifest.json に記録する
+    サービスごとに最後に書いたワークブックを保持し、次の書き込みでは読み込みを省く
+    （デーモンモードのように同じインスタンスで何度も書き込む場合に効く）
+    """
+    name = "excel"
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        # service_name -> (excel_path, wb, 保存直後の更新時刻)
+        self.workbooks = {}
+
+    def _open_workbook(self, service_name, month):
+        excel_path = os.path.join(self.base_dir, service_name, f"{service_name}_{month}.xlsx")
+        cached = self.workbooks.get(service_name)
+        # 保存後に他で書き換えられていなければ保持しているワークブックをそのまま使う
+        if cached and cached[0] == excel_path and os.path.exists(excel_path) \
+                and os.path.getmtime(excel_path) == cached[2]:
+            return cached[1], excel_path
+        return create_or_get_excel(self.base_dir, service_name, month)
+
+    def write_rows(self, service_name, rows):
+        by_month = OrderedDict()
+        for row in rows:
+            by_month.setdefault(shard_month(row[0]), []).append(row)
+
+        service_dir = os.path.join(self.base_dir, service_name)
+        for month, month_rows in by_month.items():
+            wb, excel_path = self._open_workbook(service_name, month)
+            # 同じ月のファイルにすでにある記事は追加しない
+            saved_links = {row[LINK_COLUMN] for row in wb.active.iter_rows(min_row=2, values_only=True)
+                           if len(row) > LINK_COLUMN}
+            month_rows = new_rows(month_rows, saved_links)
+            if not month_rows:
+                continue
+            for row in month_rows:
+                add_entry_to_excel(wb, *row)
+            try:
+                wb.save(excel_path)
+            except Exception:
+                # 保存できなかった行を含むワークブックは使い回さない
+                self.workbooks.pop(service_name, None)
+                raise
+            self.workbooks[service_name] = (excel_path, wb, os.path.getmtime(excel_path))
+
+            manifest = load_manifest(service_dir, service_name)
+            shard = manifest["shards"].setdefault(month, {"file": os.path.basename(excel_path), "rows": 0})
+            shard["rows"] += len(month_rows)
+            shard["updated_at"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            save_manifest(service_dir, manifest)
+
+    def close(self):
+        self.workbooks.clear()
+
+def read_xlsx_rows(path):
+    """ワークブックからヘッダーを除いた行を読み込む"""
+    wb = load_workbook(path, read_only=True)
+    try:
+        return [row for row in wb.active.iter_rows(min_row=2, values_only=True) if any(row)]
+    finally:
+        wb.close()
+
+def merge_shards(base_dir, service_name):
+    """
+    月別ファイル（と旧形式の {service}.xlsx）を月順に結合し、
+    {service}/{service}_merged.xlsx に出力する（レポート用）
+    """
+    service_dir = os.path.join(base_dir, service_name)
+    manifest = load_manifest(service_dir, service_name)
+
+    rows = []
+    legacy_path = os.path.join(service_dir, f"{service_name}.xlsx")
+    if os.path.exists(legacy_path):
+        rows.extend(read_xlsx_rows(legacy_path))
+    for month in sorted(manifest["shards"]):
+        shard_path = os.path.join(service_dir, manifest["shards"][month]["file"])
+        if os.path.exists(shard_path):
+            rows.extend(read_xlsx_rows(shard_path))
+
+    merged_path = os.path.join(service_dir, f"{service_name}_merged.xlsx")
+    write_xlsx(merged_path, rows)
+    print(f"→ {service_name}/{service_name}_merged.xlsx を出力しました ({len(rows)} 件, {len(manifest['shards'])} ファイル)")
+    return merged_path
+
+def merge_all_shards(base_dir, service_names=None):
+    """指定したサービス（省略時はマニフェストのある全サービス）の月別ファイルを結合"""
+    if not service_names:
+        service_names = sorted(
+            name for name in os.listdir(base_dir)
+            if os.path.exists(os.path.join(base_dir, name, MANIFEST_FILE))
+        )
+    return [merge_shards(base_dir, service_name) for service_name in service_names]
+
+def write_xlsx(path, rows):
+    """行のリストから新しいワークブックを書き出す（write_only モードで高速に作成）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(ROW_HEADERS)
+    for row in rows:
+        ws.append(list(row))
+    wb.save(path)
+
+def write_shards(base_dir, service_name, rows):
+    """
+    行を月別のワークブックに追加する（既存のファイルとマニフェストにリンクで重複を除いてマージする）
+    エクスポート元にない月や行は、そのまま残す
+    """
+    by_month = OrderedDict()
+    for row in rows:
+        by_month.setdefault(shard_month(row[0]), []).append(row)
+
+    service_dir = os.path.join(base_dir, service_name)
+    os.makedirs(service_dir, exist_ok=True)
+    manifest = load_manifest(service_dir, service_name)
+    updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    added = 0
+    for month, month_rows in by_month.items():
+        shard = manifest["shards"].get(month) or {"file": f"{service_name}_{month}.xlsx"}
+        shard_path = os.path.join(service_dir, shard["file"])
+        saved_rows = read_xlsx_rows(shard_path) if os.path.exists(shard_path) else []
+        month_rows = new_rows(month_rows, {row[LINK_COLUMN] for row in saved_rows if len(row) > LINK_COLUMN})
+        if not month_rows and month in manifest["shards"]:
+            continue
+        write_xlsx(shard_path, saved_rows + month_rows)
+        manifest["shards"][month] = dict(shard, rows=len(saved_rows) + len(month_rows), updated_at=updated_at)
+        added += len(month_rows)
+    save_manifest(service_dir, manifest)
+    print(f"→ {service_name} の月別 .xlsx に {added} 件追加しました ({len(manifest['shards'])} ファイル)")
+
+def export_xlsx(base_dir, source="sqlite"):
+    """
+    高速な出力先（sqlite または csv）に保存された行を、
+    サービスごとの月別 .xlsx にマージする
+    """
+    exported = 0
+    if source == "sqlite":
+        sink = SqliteSink(base_dir)
+        try:
+            for service_name in sink.services():
+                write_shards(base_dir, service_name, sink.read_rows(service_name))
+                exported += 1
+        finally:
+            sink.close()
+    elif source == "csv":
+        for service_name in sorted(os.listdir(base_dir)):
+            csv_path = os.path.join(base_dir, service_name, f"{service_name}.csv")
+            if not os.path.exists(csv_path):
+                continue
+            write_shards(base_dir, service_name, read_csv_rows(csv_path))
+            exported += 1
+    else:
+        raise ValueError(f"エクスポート元に指定できるのは sqlite か csv です: {source}")
+    return exported
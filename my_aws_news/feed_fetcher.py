@@ -0,0 +1,88 @@
+import os
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+# フィード取得の同時実行数とタイムアウト（秒）
+MAX_FETCH_WORKERS = int(os.getenv("FEED_FETCH_WORKERS", "8"))
+FETCH_TIMEOUT = float(os.getenv("FEED_FETCH_TIMEOUT", "30"))
+
+def create_session(pool_size=MAX_FETCH_WORKERS):
+    """コネクションプールを共有するHTTPセッションを作成"""
+    # requests / feedparser は実際に取得するときまで読み込まない（新着なしの高速判定を軽くするため）
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_feed(session, feed_url, timeout=FETCH_TIMEOUT, cache=None):
+    """
+    フィードをダウンロードしてパースする
+    cache を指定した場合は条件付きGETを行い、304なら保存済みのエントリーを返す
+    """
+    headers = cache.request_headers(feed_url) if cache else {}
+    response = session.get(feed_url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cache:
+        feed = cache.cached_feed(feed_url)
+        if feed is not None:
+            print(f"フィード未更新のためキャッシュを使用: {feed_url}")
+            return feed
+        # キャッシュが読めない場合は条件なしで取り直す
+        response = session.get(feed_url, timeout=timeout)
+    response.raise_for_status()
+
+    import feedparser
+    feed = feedparser.parse(response.content, response_headers=dict(response.headers))
+    if cache:
+        cache.store(feed_url, feed, response.headers)
+    return feed
+
+def entry_to_article(entry, feed_url=None):
+    """
+    フィードのエントリーをパイプラインで扱う記事の辞書に変換（記事IDはURLを使用）
+    feed は取得元のフィード（類似記事の判定で同じフィードの記事同士を除くのに使う）
+    """
+    return {
+        'article_id': entry.link,
+        'date': datetime.now().strftime("%Y-%m-%d"),
+        'title': entry.title,
+        'link': entry.link,
+        'summary': entry.summary if hasattr(entry, 'summary') else entry.get('description', ''),
+        'feed': feed_url,
+    }
+
+def fetch_feeds_concurrently(feed_urls, max_workers=MAX_FETCH_WORKERS, cache=None):
+    """
+    全フィードを並行して取得し、完了した順に (feed_url, feed) を返すジェネレーター
+    取得に失敗したフィードは feed が None になる
+    同時に取得中のフィードは max_workers 件までで、呼び出し側が結果を受け取るまで
+    次のフィードの取得は始めない（下流が遅ければ取得も自然に遅くなる）
+    """
+    feed_urls = list(feed_urls)
+    if not feed_urls:
+        return
+
+    workers = max(1, min(max_workers, len(feed_urls)))
+    remaining = iter(feed_urls)
+    with create_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for feed_url in islice(remaining, workers):
+            futures[executor.submit(fetch_feed, session, feed_url, cache=cache)] = feed_url
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                feed_url = futures.pop(future)
+                try:
+                    feed = future.result()
+                except Exception as e:
+                    print(f"RSSフィード {feed_url} の取得中にエラー: {e}")
+                    feed = None
+                yield feed_url, feed
+
+                next_url = next(remaining, None)
+                if next_url is not None:
+                    futures[executor.submit(fetch_feed, session, next_url, cache=cache)] = next_url
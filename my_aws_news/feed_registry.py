@@ -0,0 +1,132 @@
+"""
+フィードの登録簿（OPML）と、フィードを分割して複数プロセスで取得するワーカー
+
+フィードはURLのハッシュで FEED_SHARD_COUNT 個のシャードに固定で割り当てる
+各シャードのポーリング状態（間隔・最終取得・新着の最終時刻・失敗回数）は
+シャードごとのファイルに保存し、そのシャードを担当するワーカーだけが読み書きする
+ワーカーは取得した記事を親プロセスに返すだけで、出力先や処理済みの記録には書き込まない
+"""
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# シャードの数（ワーカー数を変えてもフィードの割り当てと状態ファイルは変わらない）
+FEED_SHARD_COUNT = int(os.getenv("FEED_SHARD_COUNT", "16"))
+
+def load_opml(path):
+    """
+    OPMLファイルからフィードを読み込み、{'url', 'title', 'interval'} のリストを返す
+    outline 要素の xmlUrl をフィードURLとし、interval 属性（秒）があれば初期のポーリング間隔にする
+    """
+    root = ET.parse(path).getroot()
+    feeds = []
+    seen = set()
+    for outline in root.iter('outline'):
+        url = (outline.get('xmlUrl') or '').strip()
+        if not url or url in seen:
+            continue
+        seen.add(url)
+        interval = outline.get('interval')
+        feeds.append({
+            'url': url,
+            'title': outline.get('title') or outline.get('text') or url,
+            'interval': float(interval) if interval else None,
+        })
+    return feeds
+
+def shard_index(feed_url, shard_count=FEED_SHARD_COUNT):
+    """フィードURLからシャード番号を決める（プロセスや実行をまたいで同じ値になる）"""
+    digest = hashlib.sha1(feed_url.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % shard_count
+
+def shard_feeds(feeds, shard_count=FEED_SHARD_COUNT):
+    """フィードをシャードごとに分ける（フィードのないシャードは含めない）"""
+    shards = {}
+    for feed in feeds:
+        shards.setdefault(shard_index(feed['url'], shard_count), []).append(feed)
+    return dict(sorted(shards.items()))
+
+def shard_state_file(state_dir, index):
+    return os.path.join(state_dir, f"shard-{index:03d}.json")
+
+def fetch_shard(index, feeds, state_dir, feed_cache_dir, due_only=True):
+    """
+    ワーカープロセスで1つのシャードを取得する
+    ポーリング時刻になったフィードだけを取得し、シャードの状態を保存して
+    (シャード番号, 記事のリスト, 取得したフィード数, 失敗したフィード数) を返す
+    """
+    import shared
+    from news_common.cassette import install_cassette
+    from daemon import FeedSchedule
+    from news_common.feed_cache import FeedCache
+    from feed_fetcher import entry_to_article, fetch_feeds_concurrently
+
+    # spawn で起動したワーカーにはカセットの差し替えが引き継がれないので入れ直す
+    install_cassette(directory=shared.CASSETTE_DIR)
+    schedule = FeedSchedule(
+        [feed['url'] for feed in feeds], shard_state_file(state_dir, index),
+        intervals={feed['url']: feed['interval'] for feed in feeds if feed['interval']},
+        resume=True,
+    )
+    feed_urls = schedule.due_feeds() if due_only else [feed['url'] for feed in feeds]
+
+    articles = []
+    failed = 0
+    for feed_url, feed in fetch_feeds_concurrently(feed_urls, cache=FeedCache(feed_cache_dir)):
+        schedule.record_poll(feed_url, feed)
+        if feed is None:
+            failed += 1
+            continue
+        for entry in feed.entries:
+            try:
+                articles.append(entry_to_article(entry, feed_url))
+            except AttributeError:
+                # タイトルやリンクのないエントリーは扱えない
+                continue
+    schedule.save()
+    return index, articles, len(feed_urls), failed
+
+def fetch_sharded(feeds, workers, state_dir, feed_cache_dir, due_only=True):
+    """
+    フィードをシャードに分けてプロセスプールで取得し、
+    シャードの取得が終わった順に記事を1件ずつ返すジェネレーター
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    shards = shard_feeds(feeds)
+    print(f"\nフィード {len(feeds)} 件を {len(shards)} シャード・{workers} プロセスで取得中...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(fetch_shard, index, shard, state_dir, feed_cache_dir, due_only)
+            for index, shard in shards.items()
+        ]
+        for future in as_completed(futures):
+            try:
+                index, articles, polled, failed = future.result()
+            except Exception as e:
+                print(f"シャードの取得中にエラー: {e}")
+                continue
+            print(f"シャード {index}: フィード {polled} 件を取得（失敗 {failed} 件）, 記事 {len(articles)} 件")
+            yield from articles
+
+def load_registry_status(feeds, state_dir):
+    """全シャードの状態ファイルから、フィードごとのポーリング状態を返す"""
+    status = {}
+    for index, shard in shard_feeds(feeds).items():
+        path = shard_state_file(state_dir, index)
+        saved = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        for feed in shard:
+            state = saved.get(feed['url'], {})
+            status[feed['url']] = {
+                'title': feed['title'],
+                'shard': index,
+                'interval': state.get('interval', feed['interval']),
+                'last_poll': state.get('last_poll'),
+                'last_seen': state.get('last_new_at'),
+                'failures': state.get('failures', 0),
+            }
+    return status
@@ -0,0 +1,167 @@
+import html
+import os
+import re
+import threading
+import unicodedata
+from html.parser import HTMLParser
+
+# 要約に送る記事本文のトークン数の上限（0 以下なら切り詰めない）
+SUMMARY_INPUT_TOKEN_BUDGET = int(os.getenv("SUMMARY_INPUT_TOKEN_BUDGET", "1500"))
+
+# 本文として扱わない要素（中身ごと捨てる）
+SKIP_TAGS = {"script", "style", "noscript", "svg", "iframe", "figure", "figcaption", "nav", "footer"}
+# 改行として扱う要素
+BLOCK_TAGS = {"p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+              "tr", "table", "section", "article", "blockquote", "pre", "hr"}
+
+# フィードの本文末尾に付く定型文
+BOILERPLATE_PATTERNS = [
+    re.compile(r'^The post .+ appeared first on .+\.?$', re.IGNORECASE),
+    re.compile(r'^(Read more|Continue reading|Learn more)\b.*$', re.IGNORECASE),
+    re.compile(r'^(続きを読む|詳細はこちら|続きはこちら|この記事を読む).*$'),
+    re.compile(r'^\[?(…|\.\.\.)\]?$'),
+]
+
+class _TextExtractor(HTMLParser):
+    """HTMLから本文のテキストだけを取り出す"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+def strip_html(text):
+    """HTMLタグを取り除き、ブロック要素の区切りを改行にしたテキストを返す"""
+    if '<' not in text:
+        return html.unescape(text)
+    extractor = _TextExtractor()
+    try:
+        extractor.feed(text)
+        extractor.close()
+    except Exception:
+        # 壊れたHTMLはタグを正規表現で落とすだけにする
+        return html.unescape(re.sub(r'<[^>]+>', ' ', text))
+    return "".join(extractor.parts)
+
+def clean_lines(text):
+    """行ごとに空白をまとめ、空行・定型文・同じ内容の行を取り除く"""
+    lines = []
+    seen = set()
+    for line in text.splitlines():
+        line = re.sub(r'\s+', ' ', line).strip()
+        if not line or any(pattern.match(line) for pattern in BOILERPLATE_PATTERNS):
+            continue
+        key = unicodedata.normalize('NFKC', line).casefold()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return "\n".join(lines)
+
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    """tiktoken があればそのエンコーディングを返す（なければ None）"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+def estimate_tokens(text):
+    """
+    トークン数を見積もる
+    tiktoken があれば正確に数え、なければ日本語は1文字1トークン・英数字は4文字1トークンで概算する
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    ascii_count = sum(1 for char in text if char.isascii())
+    return (ascii_count + 3) // 4 + (len(text) - ascii_count)
+
+def truncate_to_budget(text, budget):
+    """トークン数が budget 以下になるよう末尾を切り詰める（なるべく文の区切りで切る）"""
+    if budget <= 0 or estimate_tokens(text) <= budget:
+        return text
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        truncated = encoding.decode(encoding.encode(text)[:budget])
+    else:
+        # 見積もりが budget に収まる最長の先頭部分を二分探索で求める
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(text[:middle]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        truncated = text[:low]
+
+    # 後ろ2割以内に文の区切りがあればそこで切る
+    cut = max(truncated.rfind(mark) for mark in ("。", ". ", "\n", "！", "？"))
+    if cut >= len(truncated) * 0.8:
+        truncated = truncated[:cut + 1]
+    return truncated.rstrip() + " …"
+
+class InputTokenStats:
+    """実行中に要約へ送った入力のトークン数（整形前・整形後）の合計"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.articles = 0
+        self.before = 0
+        self.after = 0
+
+    def add(self, before, after):
+        with self.lock:
+            self.articles += 1
+            self.before += before
+            self.after += after
+
+    def report(self):
+        with self.lock:
+            if not self.articles:
+                return None
+            saved = 100 * (self.before - self.after) / self.before if self.before else 0
+            return f"要約の入力トークン合計: {self.before} → {self.after} (-{saved:.0f}%, {self.articles} 件)"
+
+token_stats = InputTokenStats()
+
+def prepare_summary_input(text, budget=SUMMARY_INPUT_TOKEN_BUDGET):
+    """
+    記事本文を要約用に整形する
+    HTML除去 → 空白・定型文・重複行の除去 → トークン数の上限で切り詰め
+    戻り値は (整形後のテキスト, 整形前のトークン数, 整形後のトークン数)
+    """
+    text = text or ""
+    before = estimate_tokens(text)
+    prepared = truncate_to_budget(clean_lines(strip_html(text)), budget)
+    after = estimate_tokens(prepared)
+    token_stats.add(before, after)
+    return prepared, before, after
@@ -0,0 +1,247 @@
+"""
+OpenAI API のローカル代替サーバー（ネットワークなしでの動作確認・ベンチマーク用）
+
+chat.completions / files / batches の各エンドポイントと、テスト用のRSSフィードを提供する
+要約は入力記事の先頭を切り出しただけの決定的な文字列を返す
+
+使い方:
+    python local_openai_server.py --port 8089 --latency 0.5
+    set OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+    set OPENAI_API_KEY=dummy
+    set AWS_NEWS_RSS=http://127.0.0.1:8089/feed.xml?n=20
+    python main.py --batch
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+SUMMARY_LENGTH = 200
+
+def fake_summary(messages):
+    """最後のメッセージから記事部分を取り出し、先頭を要約として返す"""
+    content = messages[-1]["content"] if messages else ""
+    text = content.split("\n", 1)[-1]
+    return f"[ローカル要約] {text[:SUMMARY_LENGTH]}"
+
+def chat_completion(body):
+    """chat.completions のレスポンスを作成"""
+    summary = fake_summary(body.get("messages", []))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "local"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": summary},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+def sample_feed(entry_count, seed):
+    """テスト用のRSSフィードを作成"""
+    items = []
+    for i in range(entry_count):
+        title = f"Amazon EC2 サンプル記事 {seed}-{i}"
+        link = f"https://example.com/{seed}/{i}"
+        description = f"<p>{title} の本文です。" + "新機能の詳細を説明します。" * 20 + "</p>"
+        items.append(
+            f"<item><title>{escape(title)}</title><link>{link}</link><guid>{link}</guid>"
+            f"<description>{escape(description)}</description></item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Local feed {seed}</title>{''.join(items)}</channel></rss>"
+    ).encode("utf-8")
+
+class LocalOpenAIState:
+    """アップロードされたファイルとバッチジョブを保持する"""
+
+    def __init__(self, latency=0.0, batch_delay=0.0):
+        self.latency = latency
+        self.batch_delay = batch_delay
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def add_file(self, filename, purpose, content):
+        file_id = f"file-{uuid.uuid4().hex}"
+        file_object = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_id] = (file_object, content)
+        return file_object
+
+    def create_batch(self, body):
+        now = int(time.time())
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "errors": None,
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": now,
+            "in_progress_at": now,
+            "expires_at": now + 86400,
+            "completed_at": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": body.get("metadata"),
+        }
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        return batch
+
+    def refresh_batch(self, batch_id):
+        """batch_delay 秒経過したジョブを完了させ、出力ファイルを作る"""
+        with self.lock:
+            batch = self.batches.get(batch_id)
+        if batch is None or batch["status"] != "in_progress":
+            return batch
+        if time.time() - batch["created_at"] < self.batch_delay:
+            return batch
+
+        _, content = self.files[batch["input_file_id"]]
+        output_lines = []
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            output_lines.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": chat_completion(request["body"])},
+                "error": None,
+            }, ensure_ascii=False))
+        output_file = self.add_file(f"{batch_id}_output.jsonl", "batch_output",
+                                    ("\n".join(output_lines) + "\n").encode("utf-8"))
+        with self.lock:
+            batch.update({
+                "status": "completed",
+                "output_file_id": output_file["id"],
+                "completed_at": int(time.time()),
+                "request_counts": {"total": len(output_lines), "completed": len(output_lines), "failed": 0},
+            })
+        return batch
+
+class LocalOpenAIHandler(BaseHTTPRequestHandler):
+    server_version = "LocalOpenAI/1.0"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._send_bytes(body, "application/json", status)
+
+    def _send_bytes(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self._send_json({"error": {"message": f"Unknown path: {self.path}", "type": "invalid_request_error"}}, 404)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+
+        if url.path == "/feed.xml":
+            query = parse_qs(url.query)
+            entry_count = int(query.get("n", ["10"])[0])
+            seed = query.get("seed", ["0"])[0]
+            self._send_bytes(sample_feed(entry_count, seed), "application/rss+xml; charset=utf-8")
+        elif parts[:2] == ["v1", "files"] and len(parts) == 3 and parts[2] in self.state.files:
+            self._send_json(self.state.files[parts[2]][0])
+        elif parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content" and parts[2] in self.state.files:
+            self._send_bytes(self.state.files[parts[2]][1], "application/octet-stream")
+        elif parts[:2] == ["v1", "batches"] and len(parts) == 3:
+            batch = self.state.refresh_batch(parts[2])
+            if batch is None:
+                self._not_found()
+            else:
+                self._send_json(batch)
+        else:
+            self._not_found()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self._read_body()
+
+        if url.path == "/v1/chat/completions":
+            if self.state.latency:
+                time.sleep(self.state.latency)
+            self._send_json(chat_completion(json.loads(body)))
+        elif url.path == "/v1/files":
+            fields = self._parse_multipart(body)
+            filename, content = fields["file"]
+            self._send_json(self.state.add_file(filename, fields["purpose"][1].decode("utf-8"), content))
+        elif url.path == "/v1/batches":
+            self._send_json(self.state.create_batch(json.loads(body)))
+        else:
+            self._not_found()
+
+    def _parse_multipart(self, body):
+        """multipart/form-data を {フィールド名: (ファイル名, 内容)} に変換"""
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8")
+        message = BytesParser(policy=HTTP).parsebytes(header + body)
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+        return fields
+
+def start_server(host="127.0.0.1", port=8089, latency=0.0, batch_delay=0.0):
+    """バックグラウンドスレッドでサーバーを起動し、サーバーを返す"""
+    server = ThreadingHTTPServer((host, port), LocalOpenAIHandler)
+    server.state = LocalOpenAIState(latency=latency, batch_delay=batch_delay)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI API のローカル代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="chat.completions 1件あたりの遅延（秒）")
+    parser.add_argument("--batch-delay", type=float, default=0.0, help="バッチジョブが完了するまでの時間（秒）")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), LocalOpenAIHandler)
+    server.state = LocalOpenAIState(latency=args.latency, batch_delay=args.batch_delay)
+    print(f"ローカルOpenAIサーバーを起動しました: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
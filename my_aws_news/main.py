@@ -1,13 +1,30 @@
+import argparse
 import os
-import feedparser
-import openai
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from datetime import datetime
 import pathlib
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font
+import shared
 from service_classifier import load_service_list, find_service_for_article
 from article_manager import ArticleManager
+from sinks import BatchWriter, create_sinks, OUTPUT_SINKS
+from news_common.feed_cache import FeedCache
+from feed_fetcher import fetch_feeds_concurrently, entry_to_article, MAX_FETCH_WORKERS, FETCH_TIMEOUT
+from news_common.feed_scan import fetch_feed_links
+from near_duplicate import NearDuplicateIndex, article_fingerprint, link_host
+from pipeline import Pipeline
+from summarizer import SummaryExecutor, SUMMARY_MODEL, SUMMARY_PROMPT
+from batch_summarizer import load_batch_state, submit_batch, collect_batch, clear_batch_state
+from news_common.summary_cache import SummaryCache
+from search_index import SearchIndex
+from input_prep import token_stats
+from news_common.llm_call import get_llm_caller
+from feed_registry import load_opml, fetch_sharded, load_registry_status
+from daemon import FeedSchedule, DaemonMetrics, start_metrics_server
+from news_common.cassette import install_cassette
 
 # 環境変数の読み込み
 load_dotenv()
@@ -21,55 +38,296 @@ RSS_FEEDS = [
     os.getenv("AWS_JP_BLOG_RSS", "https://aws.amazon.com/jp/blogs/news/feed/")
 ]
 
+# OPMLファイルを指定すると、上の RSS_FEEDS の代わりにその全フィードを取得する
+FEED_OPML_FILE = os.getenv("FEED_OPML_FILE", "")
+# 1以上なら、フィードをシャードに分けてこの数のプロセスで取得する
+FEED_WORKERS = int(os.getenv("FEED_WORKERS", "0"))
+
 # 出力先のベースディレクトリを設定
 BASE_OUTPUT_DIR = os.path.expanduser("~/OneDrive/デスクトップ/aws_news_summary")
-PROCESSED_ARTICLES_FILE = os.path.join(BASE_OUTPUT_DIR, "processed_articles.json")
+
+def set_output_dir(base_dir):
+    """出力先のベースディレクトリと、その下に置く状態ファイル・キャッシュのパスをまとめて設定"""
+    global BASE_OUTPUT_DIR, PROCESSED_ARTICLES_FILE, FEED_CACHE_DIR, SUMMARY_CACHE_FILE, BATCH_STATE_FILE
+    global DAEMON_STATE_FILE, SEARCH_INDEX_FILE, FEED_REGISTRY_DIR
+    BASE_OUTPUT_DIR = base_dir
+    PROCESSED_ARTICLES_FILE = os.path.join(base_dir, "processed_articles.json")
+    FEED_CACHE_DIR = os.path.join(base_dir, "feed_cache")
+    SUMMARY_CACHE_FILE = os.path.join(base_dir, "summary_cache.db")
+    BATCH_STATE_FILE = os.path.join(base_dir, "batch_state.json")
+    DAEMON_STATE_FILE = os.path.join(base_dir, "feed_schedule.json")
+    SEARCH_INDEX_FILE = os.path.join(base_dir, "search_index.db")
+    FEED_REGISTRY_DIR = os.path.join(base_dir, "feed_registry")
+
+set_output_dir(BASE_OUTPUT_DIR)
+
+# デーモンモードで古い記事履歴をクリーンアップする間隔（秒）
+DAEMON_CLEANUP_INTERVAL = 24 * 60 * 60
 
 def ensure_directory_exists(path):
     """ディレクトリが存在しない場合は作成"""
     os.makedirs(path, exist_ok=True)
 
-def create_or_get_excel(service_name):
-    """サービス用のExcelファイルを作成または取得"""
-    service_dir = os.path.join(BASE_OUTPUT_DIR, service_name)
-    ensure_directory_exists(service_dir)
-    
-    excel_path = os.path.join(service_dir, f"{service_name}.xlsx")
-    
-    if os.path.exists(excel_path):
-        wb = load_workbook(excel_path)
-    else:
-        wb = Workbook()
-        ws = wb.active
-        headers = ["日付", "タイトル", "要約", "リンク"]
-        ws.append(headers)
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-    
-    return wb, excel_path
+def load_feeds():
+    """取得するフィードの一覧を {'url', 'title', 'interval'} のリストで返す"""
+    if FEED_OPML_FILE:
+        return load_opml(FEED_OPML_FILE)
+    return [{'url': url, 'title': url, 'interval': None} for url in RSS_FEEDS]
 
-def summarize_with_gpt(text):
-    """o1-miniで記事を要約"""
-    try:
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model="o1-mini",
-            messages=[
-                {"role": "user", "content": "あなたは優秀な要約者です。次の内容を200文字程度で要約してください。"},
-                {"role": "user", "content": f"以下の記事を要約してください：\n{text}"}
-            ]
+def has_unprocessed_entries(article_manager, feed_cache=None):
+    """
+    高速判定: 各フィードのエントリーのリンクを処理済みの記録と照合し、
+    未処理の記事が1件でもありそうなら True を返す
+    openai / openpyxl / feedparser を読み込まずに判定し、取得・判定できないフィードがあれば True
+    （高速判定は urllib で取得するので、requests で取得する通常の処理なら取得できることがある）
+    """
+    if feed_cache is None:
+        feed_cache = FeedCache(FEED_CACHE_DIR)
+    feed_urls = [feed['url'] for feed in load_feeds()]
+    workers = max(1, min(MAX_FETCH_WORKERS, len(feed_urls)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda feed_url: fetch_feed_links(feed_url, feed_cache, FETCH_TIMEOUT), feed_urls
+        ))
+
+    for feed_url, (links, failed) in zip(feed_urls, results):
+        if failed:
+            print(f"高速判定: {feed_url} を取得できないため通常の処理を行います")
+            return True
+        if links is None:
+            print(f"高速判定: {feed_url} のエントリーを判定できないため通常の処理を行います")
+            return True
+        if any(not article_manager.is_article_processed(link, link) for link in links):
+            return True
+    return False
+
+def fetch_stage(feed_urls=None, feed_cache=None, on_feed=None):
+    """
+    fetch: RSSフィードを並行取得し、取得が完了したフィードの記事から1件ずつ流す
+    feed_urls を省略すると全フィードを取得する
+    on_feed を指定すると、フィードごとに (feed_url, feed) で呼び出す（取得失敗時の feed は None）
+    """
+    feed_urls = [feed['url'] for feed in load_feeds()] if feed_urls is None else feed_urls
+    print(f"\nRSSフィード {len(feed_urls)} 件を並行取得中...")
+    if feed_cache is None:
+        feed_cache = FeedCache(FEED_CACHE_DIR)
+    for feed_url, feed in fetch_feeds_concurrently(feed_urls, cache=feed_cache):
+        print(f"\nRSSフィード {feed_url} を処理中...")
+        if on_feed:
+            on_feed(feed_url, feed)
+        if feed is None:
+            continue
+        
+        print(f"フィード内の記事数: {len(feed.entries)}")  # デバッグ用
+
+        for entry in feed.entries:
+            yield entry_to_article(entry, feed_url)
+
+def dedup_stage(article_manager):
+    """dedup: 処理済みの記事と、他のフィードの類似記事を取り除く"""
+    def stage(articles):
+        seen_ids = set()
+        articles_by_id = {}
+        # 同じ実行内のフィード間で重複する記事を見つけるためのインデックス
+        near_duplicates = NearDuplicateIndex()
+
+        for article in articles:
+            article_id, link, title = article['article_id'], article['link'], article['title']
+
+            # 既に処理済みの記事はスキップ
+            if article_manager.is_article_processed(article_id, link) or article_id in seen_ids:
+                print(f"スキップ（既存）: {title}")
+                continue
+            seen_ids.add(article_id)
+
+            # 他のフィードで処理済み（または処理中）の類似記事は要約せずに紐付ける
+            # 取得元のフィードが不明な記事はリンクのホストを出典とする
+            fingerprint = article_fingerprint(title, article.get('feed') or link_host(link))
+            duplicate_of = article_manager.find_near_duplicate(fingerprint)
+            if duplicate_of:
+                print(f"スキップ（類似記事 {duplicate_of} と重複）: {title}")
+                article_manager.mark_duplicates([(article_id, link, title, duplicate_of)])
+                continue
+            duplicate_of = near_duplicates.find(fingerprint)
+            if duplicate_of:
+                print(f"スキップ（類似記事 {duplicate_of} と重複）: {title}")
+                articles_by_id[duplicate_of]['duplicates'].append({
+                    'article_id': article_id, 'link': link, 'title': title
+                })
+                continue
+            near_duplicates.add(article_id, fingerprint)
+
+            print(f"\n処理中の記事タイトル: {title}")
+            article['fingerprint'] = fingerprint
+            article['duplicates'] = []
+            articles_by_id[article_id] = article
+            yield article
+    return stage
+
+def classify_stage(services):
+    """classify: タイトルからサービス名を検出"""
+    def stage(articles):
+        for article in articles:
+            article['service_name'] = find_service_for_article(services, article['title'])
+            if article['service_name'] == "Other":
+                print("→ サービス名が一致しませんでした")
+            yield article
+    return stage
+
+def summarize_stage(summary_executor):
+    """summarize: 要約を並行生成し、(記事, 要約) を記事の順序のまま流す"""
+    def stage(articles):
+        yield from summary_executor.summarize_stream(
+            articles, text_of=lambda article: article['summary'], title_of=lambda article: article['title']
         )
-        return response.choices[0].message.content
-    except Exception as e:
-        print(f"要約中にエラー発生: {e}")
-        return text
+    return stage
+
+def collect_new_articles(services, article_manager):
+    """全フィードから未処理の記事を集め、サービス名を付けて返す"""
+    pipeline = Pipeline(fetch_stage(), dedup_stage(article_manager), classify_stage(services))
+    return list(pipeline.run())
+
+def write_articles(summarized_articles, article_manager, sinks, search_index=None):
+    """
+    sink: (記事, 要約) を出力先に書き込み、保存できた記事を処理済みにする
+    戻り値は (受け取った記事数, 保存できた記事数)
+    """
+    # 書き込みはサービスごとにまとめて最後に1回だけ行う
+    writer = BatchWriter(sinks, search_index)
+    article_count = 0
+    for article, summarized_text in summarized_articles:
+        article_count += 1
+        if summarized_text is None:
+            # 要約できなかった記事は保存も処理済みにもせず、次回の実行で再度要約する
+            print(f"→ 要約できなかったため保存しません: {article['title']}")
+            continue
+        # サービスごとのバッチに追加（保存後に処理済みとしてマーク）
+        writer.add(article['service_name'], article['date'], article['title'],
+                         summarized_text, article['link'], article['article_id'],
+                         fingerprint=article.get('fingerprint'), duplicates=article.get('duplicates', []))
+
+    # サービスごとにワークブックを保存し、保存できた記事を処理済みにする
+    return article_count, writer.flush(article_manager)
+
+def run_batch_mode(services, article_manager, summary_cache, sinks, search_index=None):
+    """
+    バッチAPIモード
+    前回投入したジョブが終わっていれば結果をExcelに書き込み、
+    新しい要約待ちの記事を1つのバッチジョブとして投入する
+    """
+    saved_count = 0
+    state = load_batch_state(BATCH_STATE_FILE)
+    if state:
+        status, summaries = collect_batch(state, cache=summary_cache)
+        print(f"バッチジョブ {state['batch_id']} の状態: {status}")
+        if summaries is None:
+            # まだ実行中のジョブがあるので、新しいジョブは投入しない
+            return 0
+
+        done = [(article, summary) for article, summary in zip(state['articles'], summaries) if summary]
+        _, saved_count = write_articles(done, article_manager, sinks, search_index)
+        failed_count = len(state['articles']) - len(done)
+        if failed_count:
+            print(f"要約を取得できなかった記事 {failed_count} 件は再投入します")
+        clear_batch_state(BATCH_STATE_FILE)
+
+    new_articles = collect_new_articles(services, article_manager)
+
+    # キャッシュ済みの要約はすぐに書き込み、残りだけをバッチに投入する
+    cached = []
+    to_submit = []
+    for article in new_articles:
+        summary = summary_cache.get(SUMMARY_MODEL, SUMMARY_PROMPT, article['summary'])
+        if summary is not None:
+            cached.append((article, summary))
+        else:
+            to_submit.append(article)
+    if cached:
+        saved_count += write_articles(cached, article_manager, sinks, search_index)[1]
+    if to_submit:
+        submit_batch(to_submit, BATCH_STATE_FILE)
+    return saved_count
+
+def run_daemon(services, article_manager, summary_cache, sinks, search_index=None):
+    """
+    デーモンモード
+    状態・クライアント・ワークブックを読み込んだまま常駐し、
+    フィードごとに新着頻度に合わせた間隔でポーリングする
+    SIGINT / SIGTERM で現在のサイクルを終えてから停止する
+    """
+    stop_event = threading.Event()
+    def request_stop(signum, frame):
+        print("\n停止要求を受け取りました。現在の処理が終わり次第停止します")
+        stop_event.set()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    feeds = load_feeds()
+    schedule = FeedSchedule(
+        [feed['url'] for feed in feeds], DAEMON_STATE_FILE,
+        intervals={feed['url']: feed['interval'] for feed in feeds if feed['interval']},
+    )
+    metrics = DaemonMetrics(schedule)
+    metrics_server = start_metrics_server(metrics)
+    feed_cache = FeedCache(FEED_CACHE_DIR)
+    summary_executor = SummaryExecutor(cache=summary_cache)
+    last_cleanup = time.time()
+
+    polled = set()
+
+    def on_feed(feed_url, feed):
+        polled.add(feed_url)
+        new_count = schedule.record_poll(feed_url, feed)
+        if new_count:
+            print(f"→ {feed_url} に新着 {new_count} 件")
+
+    print(f"デーモンモードを開始しました（フィード {len(feeds)} 件）")
+    try:
+        while not stop_event.is_set():
+            due = schedule.due_feeds()
+            if due:
+                started_at = time.time()
+                polled.clear()
+                try:
+                    pipeline = Pipeline(
+                        fetch_stage(due, feed_cache, on_feed),
+                        dedup_stage(article_manager),
+                        classify_stage(services),
+                        summarize_stage(summary_executor),
+                    )
+                    article_count, saved_count = write_articles(pipeline.run(), article_manager, sinks, search_index)
+                    metrics.record_cycle(started_at, article_count, saved_count)
+                    print(f"\nサイクル完了: 新規記事 {article_count} 件 (保存 {saved_count} 件)")
+                except Exception as e:
+                    # 1回のサイクルの失敗で常駐を止めない
+                    print(f"サイクル中にエラー: {e}")
+                    metrics.record_error(e)
+                    # 取得まで進まなかったフィードも失敗として記録し、間隔を延ばす
+                    # （すぐに次のサイクルを始めて同じエラーを繰り返さないようにする）
+                    for feed_url in due:
+                        if feed_url not in polled:
+                            schedule.record_poll(feed_url, None)
+                schedule.save()
 
-def add_entry_to_excel(wb, date, title, summary, link):
-    """Excelに新しいエントリーを追加"""
-    ws = wb.active
-    ws.append([date, title, summary, link])
+            if time.time() - last_cleanup >= DAEMON_CLEANUP_INTERVAL:
+                article_manager.cleanup_old_entries()
+                last_cleanup = time.time()
 
-def main():
+            wait_seconds = schedule.seconds_until_next()
+            if wait_seconds:
+                print(f"次のポーリングまで {wait_seconds:.0f} 秒待機します")
+            stop_event.wait(wait_seconds)
+    finally:
+        schedule.save()
+        if metrics_server:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+
+def main(batch_mode=False, sink_names=OUTPUT_SINKS, daemon_mode=False, fast_path=True, workers=FEED_WORKERS,
+         output_dir=None):
+    """output_dir を指定すると、出力・状態ファイル・キャッシュをすべてそのディレクトリの下に置く"""
+    if output_dir:
+        set_output_dir(output_dir)
     # サービスリストを読み込み
     current_dir = os.path.dirname(os.path.abspath(__file__))
     service_list_path = os.path.join(current_dir, "service_list.txt")
@@ -84,60 +342,88 @@ def main():
     # 古い記事履歴のクリーンアップ
     article_manager.cleanup_old_entries()
 
-    # 合計の新規記事カウント
-    total_new_articles = 0
+    # 新着がなければ要約・Excelのモジュールを読み込む前に終了する
+    # （バッチモードは投入済みジョブの回収が、ワーカーモードはフィードごとの取得間隔があるので対象外）
+    if fast_path and not batch_mode and not daemon_mode and not workers \
+            and not has_unprocessed_entries(article_manager):
+        print("\n新着記事はありません（高速判定）")
+        article_manager.close()
+        return
 
-    # 各RSSフィードを処理
-    for feed_url in RSS_FEEDS:
-        print(f"\nRSSフィード {feed_url} を取得中...")
-        feed = feedparser.parse(feed_url)
-        new_articles_count = 0
-        
-        print(f"フィード内の記事数: {len(feed.entries)}")  # デバッグ用
+    summary_cache = SummaryCache(SUMMARY_CACHE_FILE)
+    sinks = create_sinks(BASE_OUTPUT_DIR, sink_names)
+    search_index = SearchIndex(SEARCH_INDEX_FILE)
+    try:
+        if daemon_mode:
+            run_daemon(services, article_manager, summary_cache, sinks, search_index)
+            return
 
-        # 各記事を処理
-        for entry in feed.entries:
-            title = entry.title
-            link = entry.link
-            summary = entry.summary if hasattr(entry, 'summary') else entry.get('description', '')
-            date = datetime.now().strftime("%Y-%m-%d")
-            
-            # 記事IDを生成（URLを使用）
-            article_id = link
-            
-            # 既に処理済みの記事はスキップ
-            if article_manager.is_article_processed(article_id, link):
-                print(f"スキップ（既存）: {title}")
-                continue
-            
-            print(f"\n処理中の記事タイトル: {title}")
-            new_articles_count += 1
-            
-            # サービス名を検出
-            service_name = find_service_for_article(services, title)
-            if service_name == "Other":
-                print("→ サービス名が一致しませんでした")
-            
-            # Excelファイルを取得または作成
-            wb, excel_path = create_or_get_excel(service_name)
-            
-            # 要約を生成
-            summarized_text = summarize_with_gpt(summary)
-            
-            # エントリーを追加と保存
-            try:
-                add_entry_to_excel(wb, date, title, summarized_text, link)
-                wb.save(excel_path)
-                # 処理済みとしてマーク
-                article_manager.mark_article_as_processed(article_id, link, title)
-                print(f"→ {service_name}/{service_name}.xlsxに保存完了")
-            except Exception as e:
-                print(f"Excelファイルの保存中にエラー: {e}")
-
-        print(f"フィード {feed_url} の処理完了: 新規記事 {new_articles_count} 件")
-        total_new_articles += new_articles_count
-
-    print(f"\n全体の処理完了: 合計新規記事 {total_new_articles} 件")
+        if batch_mode:
+            saved_count = run_batch_mode(services, article_manager, summary_cache, sinks, search_index)
+            print(f"\nバッチモードの処理完了: 保存 {saved_count} 件")
+        else:
+            # ワーカーモードでは取得だけを子プロセスで行い、出力先と処理済みの記録へはこのプロセスだけが書き込む
+            if workers:
+                source = fetch_sharded(load_feeds(), workers, FEED_REGISTRY_DIR, FEED_CACHE_DIR)
+            else:
+                source = fetch_stage()
+
+            # fetch → dedup → classify → summarize → sink を上限付きキューでつないで並行に実行
+            pipeline = Pipeline(
+                source,
+                dedup_stage(article_manager),
+                classify_stage(services),
+                summarize_stage(SummaryExecutor(cache=summary_cache)),
+            )
+            article_count, saved_count = write_articles(pipeline.run(), article_manager, sinks, search_index)
+
+            print(f"\n全体の処理完了: 合計新規記事 {article_count} 件 (保存 {saved_count} 件)")
+            for line in get_llm_caller().report():
+                print(line)
+
+        report = token_stats.report()
+        if report:
+            print(report)
+    finally:
+        for sink in sinks:
+            sink.close()
+        search_index.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AWSニュースを要約してサービスごとのExcelに保存する")
+    parser.add_argument("--batch", action="store_true",
+                        help="要約をバッチAPIで投入し、完了済みのジョブの結果を書き込む")
+    parser.add_argument("--daemon", action="store_true",
+                        help="常駐し、フィードごとに新着頻度に合わせた間隔でポーリングする")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="新着の高速判定を行わず、常に通常の処理を行う")
+    parser.add_argument("--opml", default=FEED_OPML_FILE,
+                        help="取得するフィードの一覧（OPMLファイル）")
+    parser.add_argument("--workers", type=int, default=FEED_WORKERS,
+                        help="フィードをシャードに分けて取得するプロセス数（0なら使わない）")
+    parser.add_argument("--list-feeds", action="store_true",
+                        help="フィードごとのポーリング状態（間隔・最終新着・失敗回数）を表示して終了")
+    parser.add_argument("--sinks", default=OUTPUT_SINKS,
+                        help="出力先（カンマ区切り）: excel, csv, sqlite, parquet")
+    parser.add_argument("--export-xlsx", nargs="?", const="sqlite", choices=["sqlite", "csv"],
+                        help="sqlite/csv に保存済みの記事をサービスごとの月別 .xlsx にマージして終了")
+    parser.add_argument("--merge-shards", nargs="*", metavar="SERVICE",
+                        help="月別のExcelファイルをサービスごとに1つに結合して終了（省略時は全サービス）")
+    args = parser.parse_args()
+    FEED_OPML_FILE = args.opml
+    # CASSETTE_MODE=record|replay なら通信を記録・再生する（オフラインでの計測用）
+    install_cassette(directory=shared.CASSETTE_DIR)
+    if args.list_feeds:
+        for feed_url, state in load_registry_status(load_feeds(), FEED_REGISTRY_DIR).items():
+            last_seen = datetime.fromtimestamp(state['last_seen']).strftime('%Y-%m-%d %H:%M') if state['last_seen'] else "-"
+            interval = f"{state['interval'] / 60:.0f}分" if state['interval'] else "-"
+            print(f"[{state['shard']:3}] {state['title']}  間隔 {interval}  最終新着 {last_seen}  失敗 {state['failures']}  {feed_url}")
+    elif args.export_xlsx:
+        from excel_writer import export_xlsx
+        export_xlsx(BASE_OUTPUT_DIR, source=args.export_xlsx)
+    elif args.merge_shards is not None:
+        from excel_writer import merge_all_shards
+        merge_all_shards(BASE_OUTPUT_DIR, args.merge_shards)
+    else:
+        main(batch_mode=args.batch, sink_names=args.sinks, daemon_mode=args.daemon,
+             fast_path=not args.no_fast_path, workers=args.workers)
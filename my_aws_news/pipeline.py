@@ -0,0 +1,91 @@
+import os
+import queue
+import threading
+
+# ステージ間のキューに溜められる件数（これを超えると上流のステージが待たされる）
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+
+_DONE = object()
+
+class Pipeline:
+    """
+    ジェネレーターのステージを上限付きキューでつないで並行に動かすパイプライン
+
+    source は要素を生成するイテラブル、stages は「イテラブルを受け取り、
+    イテラブルを返す関数」のリスト。各ステージは専用のスレッドで動き、
+    最後のステージの出力は run() を呼んだスレッドで受け取る
+    下流が遅いとキューが一杯になり、上流のステージは自然に待たされる
+    """
+
+    def __init__(self, source, *stages, queue_size=PIPELINE_QUEUE_SIZE):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stop_event = threading.Event()
+        self.errors = []
+
+    def _put(self, q, item):
+        """キューに追加（パイプラインが停止したら諦める）"""
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _iter_queue(self, q):
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def _run_stage(self, stage, input_queue, output_queue):
+        try:
+            items = self.source if input_queue is None else self._iter_queue(input_queue)
+            if stage is not None:
+                items = stage(items)
+            for item in items:
+                if not self._put(output_queue, item):
+                    self._stopped_midway()
+                    return
+        except Exception as e:
+            self.errors.append(e)
+            self.stop_event.set()
+        finally:
+            # 下流に終了を知らせる（下流が遅くてキューが一杯でも、停止しない限り待つ）
+            self._put(output_queue, _DONE)
+
+    def _stopped_midway(self):
+        """処理中の要素を残して止まった場合、原因のエラーがなければ記録して run() で送出させる"""
+        if not self.errors:
+            self.errors.append(RuntimeError("パイプラインが処理の途中で停止しました"))
+
+    def run(self):
+        """パイプラインを起動し、最後のステージの出力を順に返すジェネレーター"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._run_stage, args=(None, None, queues[0]), daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._run_stage, args=(stage, queues[index], queues[index + 1]), daemon=True
+            ))
+        for thread in threads:
+            thread.start()
+
+        try:
+            yield from self._iter_queue(queues[-1])
+        finally:
+            if self.errors or any(thread.is_alive() for thread in threads):
+                # 呼び出し側が途中でやめた場合も含め、全ステージを止める
+                self.stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        if self.errors:
+            raise self.errors[0]
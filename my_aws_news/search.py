@@ -0,0 +1,95 @@
+"""
+保存済み記事の全文検索
+
+使い方:
+    python search.py Lambda 東京リージョン
+    python search.py "Bedrock" --service "Amazon Bedrock" --limit 5
+    python search.py --reindex    # 既存の .xlsx / articles.db から索引を作り直す
+"""
+import argparse
+import os
+import time
+
+from search_index import SearchIndex, SEARCH_RESULT_LIMIT
+from main import BASE_OUTPUT_DIR, SEARCH_INDEX_FILE
+
+SNIPPET_LENGTH = 80
+
+def iter_saved_articles(base_dir):
+    """
+    出力先に保存済みの記事を (service, date, title, summary, link) で返す
+    articles.db (sqlite 出力) があれば使い、なければサービスごとの .xlsx を読む
+    """
+    articles_db = os.path.join(base_dir, "articles.db")
+    if os.path.exists(articles_db):
+        from sinks import SqliteSink
+        sink = SqliteSink(base_dir)
+        try:
+            for service_name in sink.services():
+                for row in sink.read_rows(service_name):
+                    yield (service_name, *row)
+        finally:
+            sink.close()
+        return
+
+    from excel_writer import read_xlsx_rows
+    for service_name in sorted(os.listdir(base_dir)):
+        service_dir = os.path.join(base_dir, service_name)
+        if not os.path.isdir(service_dir):
+            continue
+        for file_name in sorted(os.listdir(service_dir)):
+            # 結合したレポート用のファイルは月別ファイルと重複するので読まない
+            if not file_name.endswith(".xlsx") or file_name.endswith("_merged.xlsx"):
+                continue
+            for row in read_xlsx_rows(os.path.join(service_dir, file_name)):
+                yield (service_name, *[str(value) if value is not None else "" for value in row[:4]])
+
+def reindex(search_index, base_dir):
+    """保存済みの記事を索引に追加する（登録済みの記事は無視される）"""
+    start = time.perf_counter()
+    batch = []
+    added = 0
+    for article in iter_saved_articles(base_dir):
+        batch.append(article)
+        if len(batch) >= 1000:
+            added += search_index.add_articles(batch)
+            batch = []
+    if batch:
+        added += search_index.add_articles(batch)
+    elapsed = time.perf_counter() - start
+    print(f"索引に {added} 件追加しました（合計 {search_index.count()} 件, {elapsed:.1f} 秒）")
+
+def print_results(results, elapsed_ms):
+    print(f"{len(results)} 件 ({elapsed_ms:.1f} ms)\n")
+    for i, result in enumerate(results, 1):
+        summary = " ".join((result['summary'] or "").split())
+        if len(summary) > SNIPPET_LENGTH:
+            summary = summary[:SNIPPET_LENGTH] + "…"
+        print(f"{i:2}. [{result['service']}] {result['title']} ({result['date']})")
+        print(f"    {summary}")
+        print(f"    {result['link']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="保存済みのAWSニュースを全文検索する")
+    parser.add_argument("query", nargs="*", help="検索語（空白区切りの語をすべて含む記事を返す）")
+    parser.add_argument("--service", help="サービス名で絞り込む")
+    parser.add_argument("--limit", type=int, default=SEARCH_RESULT_LIMIT, help="表示する件数")
+    parser.add_argument("--reindex", action="store_true", help="保存済みの記事から索引を作り直す")
+    args = parser.parse_args()
+
+    os.makedirs(BASE_OUTPUT_DIR, exist_ok=True)
+    search_index = SearchIndex(SEARCH_INDEX_FILE)
+    try:
+        if args.reindex:
+            reindex(search_index, BASE_OUTPUT_DIR)
+        if args.query:
+            start = time.perf_counter()
+            results = search_index.search(" ".join(args.query), service=args.service, limit=args.limit)
+            print_results(results, (time.perf_counter() - start) * 1000)
+        elif not args.reindex:
+            parser.print_help()
+    finally:
+        search_index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+
+# 1回の検索で返す件数の初期値
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "20"))
+
+# trigram トークナイザーが使える最小の語の長さ（これより短い語は LIKE で絞り込む）
+TRIGRAM_LENGTH = 3
+
+class SearchIndex:
+    """
+    保存した記事の全文検索インデックス（SQLite FTS5）
+    日本語は分かち書きせずに検索できるよう trigram トークナイザーを使う
+    処理済み記事の記録とは別のデータベースに保存するので、30日の保持期間を過ぎても残る
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS search_articles (
+                    id INTEGER PRIMARY KEY,
+                    link TEXT NOT NULL UNIQUE,
+                    service TEXT,
+                    date TEXT,
+                    title TEXT,
+                    summary TEXT
+                )
+            ''')
+            # 本文は search_articles に持ち、FTS5 側は索引だけを持つ（external content）
+            self.conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+                    title, summary, service,
+                    content='search_articles', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS search_articles_ai AFTER INSERT ON search_articles BEGIN
+                    INSERT INTO search_fts (rowid, title, summary, service)
+                    VALUES (new.id, new.title, new.summary, new.service);
+                END
+            ''')
+            self.conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS search_articles_ad AFTER DELETE ON search_articles BEGIN
+                    INSERT INTO search_fts (search_fts, rowid, title, summary, service)
+                    VALUES ('delete', old.id, old.title, old.summary, old.service);
+                END
+            ''')
+
+    def add_articles(self, articles):
+        """
+        (service, date, title, summary, link) のリストを索引に追加
+        既に登録済みのリンクは無視する。追加した件数を返す
+        """
+        with self.lock, self.conn:
+            cursor = self.conn.executemany(
+                'INSERT OR IGNORE INTO search_articles (service, date, title, summary, link) VALUES (?, ?, ?, ?, ?)',
+                articles
+            )
+            return cursor.rowcount
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM search_articles').fetchone()[0]
+
+    def search(self, query, service=None, limit=SEARCH_RESULT_LIMIT):
+        """
+        空白区切りの語をすべて含む記事を関連度順（bm25、タイトルの一致を重視）に返す
+        戻り値は dict(service, date, title, summary, link, score) のリスト
+        """
+        terms = [term for term in query.split() if term]
+        if not terms:
+            return []
+
+        long_terms = [term for term in terms if len(term) >= TRIGRAM_LENGTH]
+        short_terms = [term for term in terms if len(term) < TRIGRAM_LENGTH]
+
+        conditions = []
+        params = []
+        for term in short_terms:
+            conditions.append("(a.title LIKE ? ESCAPE '\\' OR a.summary LIKE ? ESCAPE '\\' OR a.service LIKE ? ESCAPE '\\')")
+            pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params.extend([pattern, pattern, pattern])
+        if service:
+            conditions.append('a.service = ?')
+            params.append(service)
+
+        if long_terms:
+            # 各語をフレーズとして引用し、FTS5 の演算子として解釈されないようにする
+            match = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in long_terms)
+            sql = '''
+                SELECT a.service, a.date, a.title, a.summary, a.link,
+                       bm25(search_fts, 10.0, 1.0, 5.0) AS score
+                FROM search_fts JOIN search_articles a ON a.id = search_fts.rowid
+                WHERE search_fts MATCH ?
+            '''
+            params.insert(0, match)
+            order = 'score, a.id DESC'
+        else:
+            # 短い語だけの場合は索引が使えないので新しい順に返す
+            sql = '''
+                SELECT a.service, a.date, a.title, a.summary, a.link, 0.0 AS score
+                FROM search_articles a WHERE 1 = 1
+            '''
+            order = 'a.id DESC'
+
+        for condition in conditions:
+            sql += f' AND {condition}'
+        sql += f' ORDER BY {order} LIMIT ?'
+        params.append(limit)
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        keys = ('service', 'date', 'title', 'summary', 'link', 'score')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
@@ -1,22 +1,247 @@
+import hashlib
+import os
+import pickle
+import re
+import unicodedata
+from collections import deque
+
+# コンパイル済みカタログの形式を変えたら上げる（古いキャッシュは作り直される）
+CATALOG_VERSION = 1
+
+# 同じタイトルの判定結果を覚えておく件数（超えたら一度捨てる）
+CLASSIFY_MEMO_SIZE = 10000
+
+# 「Amazon EC2」→「EC2」のように、接頭辞を外すと略語になるサービス名は略語でも検出する
+SERVICE_PREFIXES = ("Amazon ", "AWS ")
+ACRONYM_PATTERN = re.compile(r'^[A-Z][A-Z0-9]{1,5}$')
+
+def fold_text(text):
+    """全角半角（NFKC）と大文字小文字の違いを取り除く"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+def _is_word_char(char):
+    # 日本語の文字は単語の区切りとして扱う（「EC2インスタンス」の EC2 も検出する）
+    return char.isascii() and char.isalnum()
+
+def acronym_alias(service):
+    """サービス名から自動で付ける略語の別名を返す（なければ None）"""
+    for prefix in SERVICE_PREFIXES:
+        if service.startswith(prefix):
+            rest = service[len(prefix):]
+            if ACRONYM_PATTERN.match(rest):
+                return rest
+    return None
+
+class ServiceMatcher:
+    """
+    サービス名の Aho-Corasick オートマトン
+    タイトルを1回走査するだけで、含まれる全サービス名を検出する
+    サービス名・別名・タイトルはすべて fold_text で正規化してから照合する
+    別名（略語など）は英数字の単語の途中では一致させない
+    """
+
+    def __init__(self, services, aliases=None, auto_aliases=True):
+        self.services = list(services)
+        aliases = aliases or {}
+        # パターンごとの (正規化した文字列の長さ, サービス番号, 単語境界が必要か)
+        self.patterns = []
+        # 状態ごとの遷移・失敗リンク・出力（一致したパターンの番号）
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.memo = {}
+
+        folded_names = {fold_text(service) for service in self.services}
+        alias_owners = {}
+        for index, service in enumerate(self.services):
+            names = list(aliases.get(service, []))
+            if auto_aliases and acronym_alias(service):
+                names.append(acronym_alias(service))
+            for alias in names:
+                folded = fold_text(alias)
+                # 他のサービスの正式名と同じ別名は使わない
+                if folded and folded not in folded_names:
+                    alias_owners.setdefault(folded, set()).add(index)
+
+        for index, service in enumerate(self.services):
+            self._add_pattern(fold_text(service), index, False)
+        for folded, owners in alias_owners.items():
+            # 複数のサービスで共有される別名はどちらか決められないので使わない
+            if len(owners) == 1:
+                self._add_pattern(folded, owners.pop(), True)
+        self._build_failure_links()
+
+    def __getstate__(self):
+        # メモはコンパイル済みカタログに含めない
+        state = self.__dict__.copy()
+        state['memo'] = {}
+        return state
+
+    def _add_pattern(self, pattern, index, word_boundary):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(len(self.patterns))
+        self.patterns.append((len(pattern), index, word_boundary))
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                # 失敗リンク先で終わるパターンもこの状態で一致する
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def __len__(self):
+        return len(self.services)
+
+    def __iter__(self):
+        return iter(self.services)
+
+    def _match(self, title):
+        text = fold_text(title)
+        # サービス番号 -> 一致した文字列の最大長
+        matched = {}
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern in self.output[state]:
+                length, index, word_boundary = self.patterns[pattern]
+                if word_boundary:
+                    start = position - length + 1
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if position + 1 < len(text) and _is_word_char(text[position + 1]):
+                        continue
+                if length > matched.get(index, 0):
+                    matched[index] = length
+
+        ordered = sorted(matched, key=lambda index: (-matched[index], index))
+        return tuple(self.services[index] for index in ordered)
+
+    def find_all(self, title):
+        """
+        タイトルに含まれる全サービス名（正式名）を返す
+        一致した文字列が長い（より具体的な）サービス名を先に、同じ長さならリスト順に並べる
+        一度判定したタイトルの結果は覚えておく
+        """
+        result = self.memo.get(title)
+        if result is None:
+            if len(self.memo) >= CLASSIFY_MEMO_SIZE:
+                self.memo.clear()
+            result = self.memo[title] = self._match(title)
+        return list(result)
+
+    def find_longest(self, title):
+        """タイトルに含まれる最も長いサービス名を返す（一致しなければ None）"""
+        matches = self.find_all(title)
+        return matches[0] if matches else None
+
+def parse_service_list(content):
+    """
+    サービスリストを解析して (サービス名のリスト, {サービス名: 別名のリスト}) を返す
+    「Amazon EC2 = Elastic Compute Cloud, EC2 インスタンス」のように = の後に別名を書ける
+    """
+    services = []
+    aliases = {}
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        name, _, alias_part = line.partition('=')
+        name = name.strip()
+        services.append(name)
+        names = [alias.strip() for alias in alias_part.split(',') if alias.strip()]
+        if names:
+            aliases[name] = names
+    return services, aliases
+
+def _catalog_cache_path(filepath):
+    directory, filename = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, "__pycache__", f"{filename}.catalog.pickle")
+
+def _load_catalog_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != CATALOG_VERSION:
+        return None
+    return cached
+
+def _save_catalog_cache(cache_path, cached):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"サービスカタログのキャッシュを保存できませんでした: {e}")
+
 def load_service_list(filepath: str):
     """
-    サービスリストをロードし、完全一致用の辞書を作成
+    サービスリストをロードし、完全一致用のオートマトンを作成
+    コンパイル済みのオートマトンは __pycache__ に保存し、リストの更新時刻・サイズ
+    （変わっていれば内容のハッシュ）が同じなら読み込み直さずに再利用する
     """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            services = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-            return services
+        stat = os.stat(filepath)
     except FileNotFoundError:
         print(f"Service list file not found: {filepath}")
-        return []
+        return ServiceMatcher([])
+
+    cache_path = _catalog_cache_path(filepath)
+    cached = _load_catalog_cache(cache_path)
+    if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        return cached['matcher']
 
-def find_service_for_article(services, title: str) -> str:
+    with open(filepath, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if cached and cached['sha256'] == digest:
+        # 内容は同じ（更新時刻だけ変わった）ならキャッシュの鍵だけ更新する
+        matcher = cached['matcher']
+    else:
+        services, aliases = parse_service_list(content.decode('utf-8'))
+        matcher = ServiceMatcher(services, aliases)
+
+    _save_catalog_cache(cache_path, {
+        'version': CATALOG_VERSION,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': digest,
+        'matcher': matcher,
+    })
+    return matcher
+
+def find_service_for_article(services, title: str, return_all: bool = False):
     """
-    タイトルに含まれるサービス名を完全一致で検索
+    タイトルに含まれるサービス名を完全一致で検索（全角半角・大文字小文字は区別しない）
+    複数一致した場合は最も長いサービス名を優先する
+    return_all=True の場合は一致した全サービス名のリストを返す
     """
-    for service in services:
-        if service in title:
-            print(f"サービス名 '{service}' がタイトルで一致しました")
-            return service
-    
-    return "Other"
\ No newline at end of file
+    if not isinstance(services, ServiceMatcher):
+        services = ServiceMatcher(services)
+
+    matches = services.find_all(title)
+    if not matches:
+        return ["Other"] if return_all else "Other"
+
+    print(f"サービス名 '{matches[0]}' がタイトルで一致しました")
+    return matches if return_all else matches[0]
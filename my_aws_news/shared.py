@@ -0,0 +1,26 @@
+"""
+リポジトリ直下の共通モジュール（news_common）を読み込めるようにする
+news_common のモジュールより先に import する
+
+news_common は logging でログを出すので、このプロジェクトの他の出力（print）と同じく
+メッセージだけを標準出力に出す
+"""
+import logging
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(PROJECT_DIR)
+# 通信の記録（CASSETTE_MODE=record|replay）の既定の保存先
+CASSETTE_DIR = os.path.join(PROJECT_DIR, "cassettes")
+
+if REPOSITORY_DIR not in sys.path:
+    sys.path.append(REPOSITORY_DIR)
+
+_logger = logging.getLogger("news_common")
+if not _logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _logger.addHandler(_handler)
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
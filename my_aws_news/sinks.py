@@ -0,0 +1,346 @@
+import csv
+import itertools
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime
+
+# 出力先（カンマ区切りで複数指定可）: excel, csv, sqlite, parquet
+OUTPUT_SINKS = os.getenv("OUTPUT_SINKS", "excel")
+
+ROW_HEADERS = ["日付", "タイトル", "要約", "リンク"]
+
+# Parquet の小さなパートファイルがこの数に達したら1つにまとめる
+PARQUET_MAX_PARTS = int(os.getenv("PARQUET_MAX_PARTS", "32"))
+# この行数以上のパートファイルはまとめる対象にしない（読み直すのは小さなパートだけ）
+PARQUET_COMPACT_ROWS = int(os.getenv("PARQUET_COMPACT_ROWS", "10000"))
+COMPACTION_TMP = ".compacting.parquet.tmp"
+# パートファイル名の連番（同じプロセス内の別インスタンスとも重ならないようにモジュールで共有する）
+_part_sequence = itertools.count(1)
+COMPACTION_JOURNAL = ".compacting.json"
+
+LINK_COLUMN = 3
+
+def new_rows(rows, saved_links):
+    """
+    保存済みのリンクの行を除く（saved_links に追加していく）
+    一部の出力先だけ書き込みに成功したバッチを次の実行で再試行しても、行が重複しないようにする
+    """
+    result = []
+    for row in rows:
+        link = row[LINK_COLUMN]
+        if link and link in saved_links:
+            continue
+        if link:
+            saved_links.add(link)
+        result.append(row)
+    return result
+
+class SavedLinks:
+    """
+    追記型の出力先ごとに、保存済みのリンクを記録する小さな索引 ({base_dir}/sink_links.db)
+    重複の確認は書き込む行のリンクの検索だけで済み、既存のファイルは読み直さない
+    """
+
+    # 1回の問い合わせに含めるリンクの数（SQLiteのパラメーター数の上限より小さくする）
+    CHUNK_SIZE = 500
+
+    def __init__(self, base_dir, sink_name):
+        self.sink_name = sink_name
+        self.conn = sqlite3.connect(os.path.join(base_dir, "sink_links.db"), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS saved_links (
+                sink TEXT NOT NULL,
+                service TEXT NOT NULL,
+                link TEXT NOT NULL,
+                PRIMARY KEY (sink, service, link)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+    def new_rows(self, service_name, rows):
+        """保存済みのリンクの行（と同じバッチ内で重複する行）を除く"""
+        links = list({row[LINK_COLUMN] for row in rows if row[LINK_COLUMN]})
+        saved = set()
+        for start in range(0, len(links), self.CHUNK_SIZE):
+            chunk = links[start:start + self.CHUNK_SIZE]
+            saved.update(link for (link,) in self.conn.execute(
+                f'SELECT link FROM saved_links WHERE sink = ? AND service = ? '
+                f'AND link IN ({", ".join("?" * len(chunk))})',
+                [self.sink_name, service_name, *chunk]
+            ))
+        return new_rows(rows, saved)
+
+    def add(self, service_name, rows):
+        """書き込みに成功した行のリンクを記録する"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO saved_links (sink, service, link) VALUES (?, ?, ?)',
+                [(self.sink_name, service_name, row[LINK_COLUMN]) for row in rows if row[LINK_COLUMN]]
+            )
+
+    def close(self):
+        self.conn.close()
+
+class RowSink(ABC):
+    """
+    サービスごとの行の出力先
+    write_rows は1サービス分の行をまとめて永続化し、失敗したら例外を送出する
+    同じリンクの行がすでに保存されていれば書き込まない（再試行しても重複しない）
+    """
+    name = "base"
+
+    @abstractmethod
+    def write_rows(self, service_name, rows):
+        pass
+
+    def close(self):
+        pass
+
+class CsvSink(RowSink):
+    """{service}/{service}.csv に追記する（既存の行は読み込まず、重複は SavedLinks で確認する）"""
+    name = "csv"
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.saved_links = SavedLinks(base_dir, self.name)
+
+    def csv_path(self, service_name):
+        return os.path.join(self.base_dir, service_name, f"{service_name}.csv")
+
+    def write_rows(self, service_name, rows):
+        path = self.csv_path(service_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        is_new = not os.path.exists(path)
+        rows = self.saved_links.new_rows(service_name, rows)
+        if not rows:
+            return
+        # Excelでそのまま開けるようにBOM付きUTF-8で作成する
+        with open(path, 'a', encoding='utf-8-sig' if is_new else 'utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(ROW_HEADERS)
+            writer.writerows(rows)
+        self.saved_links.add(service_name, rows)
+
+    def close(self):
+        self.saved_links.close()
+
+def read_csv_rows(path):
+    """CsvSink が書いたファイルからヘッダーを除いた行を読み込む"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return [tuple(row) for row in reader]
+
+class SqliteSink(RowSink):
+    """全サービスの行を1つの SQLite データベース (articles.db) に追記する"""
+    name = "sqlite"
+
+    def __init__(self, base_dir):
+        self.db_file = os.path.join(base_dir, "articles.db")
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                service TEXT NOT NULL,
+                date TEXT,
+                title TEXT,
+                summary TEXT,
+                link TEXT
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_articles_service ON articles (service, id)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_articles_link ON articles (service, link)')
+        self.conn.commit()
+
+    def write_rows(self, service_name, rows):
+        # 同じサービスに同じリンクの行があれば追加しない
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO articles (service, date, title, summary, link) '
+                'SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS '
+                '(SELECT 1 FROM articles WHERE service = ? AND link = ?)',
+                [(service_name, *row, service_name, row[LINK_COLUMN]) for row in rows]
+            )
+
+    def services(self):
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT service FROM articles ORDER BY service')]
+
+    def read_rows(self, service_name):
+        return self.conn.execute(
+            'SELECT date, title, summary, link FROM articles WHERE service = ? ORDER BY id', (service_name,)
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+class ParquetSink(RowSink):
+    """
+    {service}/parquet/ に書き込みごとの Parquet ファイルを追加する（pyarrow が必要）
+    既存ファイルは書き換えないので、1回の書き込みコストは追加した行数だけで決まる
+    小さなパートファイルが PARQUET_MAX_PARTS 個たまったら1つにまとめる
+    （PARQUET_COMPACT_ROWS 行以上のパートは読み直さないので、まとめるコストも履歴の量によらない）
+    """
+    name = "parquet"
+
+    def __init__(self, base_dir):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("parquet 出力には pyarrow が必要です: pip install pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.base_dir = base_dir
+        self.saved_links = SavedLinks(base_dir, self.name)
+
+    def _part_path(self, part_dir):
+        sequence = next(_part_sequence)
+        return os.path.join(part_dir, f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{sequence:06d}.parquet")
+
+    def write_rows(self, service_name, rows):
+        part_dir = os.path.join(self.base_dir, service_name, "parquet")
+        os.makedirs(part_dir, exist_ok=True)
+        rows = self.saved_links.new_rows(service_name, rows)
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        table = self.pa.table({
+            key: self.pa.array(list(values), type=self.pa.string())
+            for key, values in zip(["date", "title", "summary", "link"], columns)
+        })
+        self.pq.write_table(table, self._part_path(part_dir))
+        self.saved_links.add(service_name, rows)
+        self.compact(part_dir)
+
+    def _finish_compaction(self, part_dir):
+        """
+        中断したまとめ処理を仕上げる
+        まとめたファイルができていれば元のパートを削除し、できていなければ書きかけのファイルを捨てる
+        """
+        journal_path = os.path.join(part_dir, COMPACTION_JOURNAL)
+        if not os.path.exists(journal_path):
+            return
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+        if os.path.exists(os.path.join(part_dir, journal["target"])):
+            for name in journal["parts"]:
+                if os.path.exists(os.path.join(part_dir, name)):
+                    os.remove(os.path.join(part_dir, name))
+        tmp_path = os.path.join(part_dir, COMPACTION_TMP)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        os.remove(journal_path)
+
+    def compact(self, part_dir):
+        """小さなパートファイルが PARQUET_MAX_PARTS 個以上あれば、書き込み順に1つにまとめる"""
+        self._finish_compaction(part_dir)
+        parts = sorted(name for name in os.listdir(part_dir) if name.endswith(".parquet"))
+        if len(parts) < PARQUET_MAX_PARTS:
+            return
+        small = [
+            os.path.join(part_dir, name) for name in parts
+            if self.pq.ParquetFile(os.path.join(part_dir, name)).metadata.num_rows < PARQUET_COMPACT_ROWS
+        ]
+        if len(small) < PARQUET_MAX_PARTS:
+            return
+        table = self.pa.concat_tables([self.pq.read_table(path) for path in small])
+        # 読み込み側が無視する名前（. 始まり）で書き、置き換える前に削除するパートを記録しておく
+        # （途中で中断しても、次のまとめ処理で行の欠落や重複なく仕上げられる）
+        tmp_path = os.path.join(part_dir, COMPACTION_TMP)
+        target_path = self._part_path(part_dir)
+        self.pq.write_table(table, tmp_path)
+        journal_path = os.path.join(part_dir, COMPACTION_JOURNAL)
+        with open(journal_path, 'w', encoding='utf-8') as f:
+            json.dump({"target": os.path.basename(target_path), "parts": [os.path.basename(p) for p in small]}, f)
+        os.replace(tmp_path, target_path)
+        self._finish_compaction(part_dir)
+
+    def close(self):
+        self.saved_links.close()
+
+def create_sinks(base_dir, names=OUTPUT_SINKS):
+    """カンマ区切りの名前から出力先のリストを作成"""
+    sinks = []
+    for name in [n.strip().lower() for n in names.split(',') if n.strip()]:
+        if name == "excel":
+            from excel_writer import ExcelSink
+            sinks.append(ExcelSink(base_dir))
+        elif name == "csv":
+            sinks.append(CsvSink(base_dir))
+        elif name == "sqlite":
+            sinks.append(SqliteSink(base_dir))
+        elif name == "parquet":
+            sinks.append(ParquetSink(base_dir))
+        else:
+            raise ValueError(f"不明な出力先です: {name}")
+    return sinks
+
+class BatchWriter:
+    """
+    追加する行をサービスごとにまとめ、各出力先への書き込みをサービスあたり1回にするバッファ
+    全出力先への書き込みに成功したサービスの記事だけを処理済みとしてマークする
+    search_index を指定すると、保存した記事を全文検索インデックスにも追加する
+    """
+
+    def __init__(self, sinks, search_index=None):
+        self.sinks = sinks
+        self.search_index = search_index
+        # service_name -> [(row, article, fingerprint, duplicates), ...]
+        self.pending = OrderedDict()
+
+    def add(self, service_name, date, title, summary, link, article_id, fingerprint=None, duplicates=()):
+        """
+        行をバッファに追加（まだ保存はしない）
+        duplicates はこの記事の類似記事として一緒に処理済みにする記事のリスト
+        （保存時点の内容を使うので、追加後に見つかった類似記事も反映される）
+        """
+        row = (date, title, summary, link)
+        article = (article_id, link, title)
+        self.pending.setdefault(service_name, []).append((row, article, fingerprint, duplicates))
+
+    def flush(self, article_manager):
+        """サービスごとに全出力先へ書き込み、保存に成功した記事を処理済みとしてマークする"""
+        saved_count = 0
+        for service_name, rows in self.pending.items():
+            failed = False
+            for sink in self.sinks:
+                try:
+                    sink.write_rows(service_name, [row for row, *_ in rows])
+                except Exception as e:
+                    # 処理済みにしないので次の実行で再試行される
+                    # （書き込みに成功した出力先は同じリンクの行を追加しないので重複しない）
+                    print(f"{sink.name} への保存中にエラー ({service_name}): {e}")
+                    failed = True
+                    break
+            if failed:
+                continue
+
+            article_manager.mark_articles_as_processed([article for _, article, _, _ in rows])
+            article_manager.add_fingerprints([
+                (article[0], fingerprint) for _, article, fingerprint, _ in rows if fingerprint is not None
+            ])
+            article_manager.mark_duplicates([
+                (duplicate['article_id'], duplicate['link'], duplicate['title'], article[0])
+                for _, article, _, duplicates in rows for duplicate in duplicates
+            ])
+            if self.search_index:
+                try:
+                    self.search_index.add_articles([(service_name, *row) for row, *_ in rows])
+                except Exception as e:
+                    # 索引は後から作り直せるので、保存自体は成功として扱う
+                    print(f"検索インデックスへの追加中にエラー ({service_name}): {e}")
+            saved_count += len(rows)
+            print(f"→ {service_name} に {len(rows)} 件保存完了 ({', '.join(sink.name for sink in self.sinks)})")
+
+        self.pending.clear()
+        return saved_count
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
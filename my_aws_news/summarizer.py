@@ -0,0 +1,100 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import shared  # noqa: F401  news_common を読み込めるようにする
+from input_prep import prepare_summary_input
+from news_common.llm_call import call_llm
+
+SUMMARY_MODEL = "o1-mini"
+SUMMARY_PROMPT = "あなたは優秀な要約者です。次の内容を200文字程度で要約してください。"
+# 同時に実行する要約リクエスト数
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_openai_client():
+    """プロセス内で共有するOpenAIクライアント（HTTP接続プールも共有される）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # openai の読み込みは重いので、実際に要約するときまで遅らせる
+            import openai
+            # 再試行・バックオフ・サーキットブレーカーは llm_call に任せるので、SDK では再試行しない
+            _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        return _client
+
+def build_summary_messages(text, title=None):
+    """
+    要約リクエストのメッセージを作成（本文はHTML除去・トークン数の上限で整形してから送る）
+    並行して要約するとログの順序が記事の順序と揃わないので、title があれば記事名も出力する
+    """
+    prepared, before, after = prepare_summary_input(text)
+    print(f"→ 入力トークン: {before} → {after}" + (f"（{title}）" if title else ""))
+    return [
+        {"role": "user", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"以下の記事を要約してください：\n{prepared}"}
+    ]
+
+def summarize_with_gpt(text, client=None, cache=None, title=None):
+    """
+    o1-miniで記事を要約（cache があればAPI呼び出しの前に確認する）
+    呼び出しは llm_call の期限・リトライ・サーキットブレーカー付きで行い、
+    失敗した場合は None を返す（元の本文を要約の代わりに保存しないため）
+    """
+    if cache:
+        cached = cache.get(SUMMARY_MODEL, SUMMARY_PROMPT, text)
+        if cached is not None:
+            print("→ 要約キャッシュを使用" + (f"（{title}）" if title else ""))
+            return cached
+    try:
+        client = client or get_openai_client()
+        response = call_llm(
+            client.chat.completions.create,
+            SUMMARY_MODEL,
+            messages=build_summary_messages(text, title)
+        )
+        summary = response.choices[0].message.content
+        if cache and summary:
+            cache.put(SUMMARY_MODEL, SUMMARY_PROMPT, text, summary)
+        return summary or None
+    except Exception as e:
+        print(f"要約中にエラー発生: {e}" + (f"（{title}）" if title else ""))
+        return None
+
+class SummaryExecutor:
+    """
+    1つのクライアントを共有し、最大 max_workers 件の要約リクエストを並行して実行する
+    結果は入力と同じ順序で返す
+    """
+
+    def __init__(self, max_workers=SUMMARY_CONCURRENCY, client=None, cache=None):
+        self.max_workers = max(1, max_workers)
+        self.client = client
+        self.cache = cache
+
+    def summarize_stream(self, items, text_of=lambda item: item, title_of=lambda item: None):
+        """
+        items を順に要約し、(item, 要約) を入力と同じ順序で返すジェネレーター
+        title_of は要約中のログに出す記事名
+        実行中のリクエストは max_workers 件までで、それを超える入力は読み込まない
+        """
+        client = self.client or get_openai_client()
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for item in items:
+                in_flight.append((item, executor.submit(
+                    summarize_with_gpt, text_of(item), client, self.cache, title_of(item)
+                )))
+                if len(in_flight) >= self.max_workers:
+                    item, future = in_flight.popleft()
+                    yield item, future.result()
+            while in_flight:
+                item, future = in_flight.popleft()
+                yield item, future.result()
+
+    def summarize_all(self, texts):
+        """テキストのリストを要約し、同じ順序で要約のリストを返す"""
+        return [summary for _, summary in self.summarize_stream(texts)]
@@ -0,0 +1,12 @@
+"""
+my_aws_news と test-podcast で共通に使うモジュール
+
+- cassette: HTTP通信の記録・再生
+- feed_cache: 条件付きGETのためのフィードキャッシュ
+- feed_scan: 新着の高速判定用の軽量フィードスキャナー
+- llm_call: LLM API 呼び出しのタイムアウト・リトライ・サーキットブレーカー
+- summary_cache: 要約結果のキャッシュ
+
+各プロジェクトは shared.py でリポジトリ直下を sys.path に加えてから読み込む
+ログは logging の news_common.* のロガーに出力する
+"""
@@ -0,0 +1,289 @@
+"""
+HTTP通信の記録・再生（カセット）
+
+一度実際の通信をカセットディレクトリに記録し、以降はネットワークなしで同じ応答を再生する
+requests（フィード・記事ページの取得）、httpx（openai クライアント）、urllib（新着の高速判定）の
+通信をまとめて差し替えるので、パイプライン全体をオフラインで再現性のある形で計測できる
+
+環境変数:
+    CASSETTE_MODE=record|replay|off   （既定は off）
+    CASSETTE_DIR=カセットのディレクトリ（既定は install_cassette に渡したディレクトリ。.gitignore で除外済みの
+                 各プロジェクトの cassettes/ を渡している）
+    CASSETTE_LATENCY=0.2              再生時に応答ごとに加える遅延（秒）
+    CASSETTE_LATENCY_SCALE=1.0        再生時に記録時の所要時間の何倍を待つか（0 なら待たない）
+
+同じリクエスト（メソッド・URL・本文）が複数回あった場合は記録した順に応答を返し、
+記録より多く呼ばれたら最後の応答を繰り返す
+記録のないリクエストには 404 を返す（リトライされずにその記事・フィードだけが失敗扱いになる）
+フィードの到着順で結果が変わる処理（類似記事の除外など）があるため、
+記録時と大きく異なる遅延で再生すると記録にないリクエストが発生することがある
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_DIR = os.getenv("CASSETTE_DIR")
+CASSETTE_LATENCY = float(os.getenv("CASSETTE_LATENCY", "0"))
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "0"))
+
+# 記録のないリクエストに返す応答
+MISS_STATUS = 404
+MISS_REASON = "Not Recorded"
+
+# 記録しないヘッダー（APIキーなど）
+SECRET_HEADERS = {"authorization", "openai-organization", "openai-project", "cookie", "set-cookie"}
+
+def _normalize_body(body, content_type):
+    """
+    リクエストの本文を比較用に正規化する
+    JSONのキー順と、multipart の区切り文字列・ファイル名（時刻を含むことがある）の違いは無視する
+    """
+    if not body:
+        return b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    content_type = content_type or ""
+    if "json" in content_type:
+        try:
+            return json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False).encode("utf-8")
+        except ValueError:
+            return body
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if match:
+        body = body.replace(match.group(1).encode("latin-1"), b"BOUNDARY")
+        return re.sub(rb'filename="[^"]*"', b'filename=""', body)
+    return body
+
+class Cassette:
+    """リクエストごとの応答の並びをファイルに保存・再生する"""
+
+    def __init__(self, directory, mode, latency=CASSETTE_LATENCY, latency_scale=CASSETTE_LATENCY_SCALE):
+        self.directory = directory
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.lock = threading.Lock()
+        # 記録モード: この実行で記録を始めたキー / 再生モード: キーごとの再生位置
+        self.recorded = {}
+        self.positions = {}
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, method, url, body=b"", content_type=None):
+        digest = hashlib.sha256()
+        digest.update(method.upper().encode("utf-8") + b"\0" + url.encode("utf-8") + b"\0")
+        digest.update(_normalize_body(body, content_type))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def record(self, key, method, url, status, reason, headers, body, elapsed):
+        response = {
+            "status": status,
+            "reason": reason,
+            "headers": [[name, value] for name, value in headers if name.lower() not in SECRET_HEADERS],
+            "body": base64.b64encode(body or b"").decode("ascii"),
+            "elapsed": round(elapsed, 4),
+        }
+        with self.lock:
+            # この実行で初めてのキーなら、以前の記録を上書きする
+            interaction = self.recorded.setdefault(key, {"method": method, "url": url, "responses": []})
+            interaction["responses"].append(response)
+            tmp_path = f"{self._path(key)}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(interaction, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self._path(key))
+
+    def play(self, key, method, url):
+        """記録された応答を (status, reason, headers, body, 待つ秒数) で返す"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                interaction = json.load(f)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            logger.warning(f"カセットに記録がありません: {method} {url}")
+            body = json.dumps({"error": {"message": f"Not recorded in cassette: {method} {url}",
+                                         "type": "cassette_miss"}}).encode("utf-8")
+            return MISS_STATUS, MISS_REASON, [["Content-Type", "application/json"]], body, 0
+        with self.lock:
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+        responses = interaction["responses"]
+        response = responses[min(position, len(responses) - 1)]
+        delay = self.latency + self.latency_scale * response.get("elapsed", 0)
+        return (response["status"], response.get("reason", ""), response["headers"],
+                base64.b64decode(response["body"]), delay)
+
+def _patch_requests(cassette):
+    """requests のすべてのセッションが使う HTTPAdapter.send を差し替える"""
+    try:
+        from requests import Response
+        from requests.adapters import HTTPAdapter
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+    except ImportError:
+        return
+    original_send = HTTPAdapter.send
+
+    def send(self, request, **kwargs):
+        content_type = request.headers.get("Content-Type")
+        key = cassette.key(request.method, request.url, request.body, content_type)
+        if cassette.mode == "record":
+            start = time.perf_counter()
+            response = original_send(self, request, **kwargs)
+            cassette.record(key, request.method, request.url, response.status_code, response.reason,
+                            list(response.headers.items()), response.content, time.perf_counter() - start)
+            return response
+
+        status, reason, headers, body, delay = cassette.play(key, request.method, request.url)
+        if delay:
+            time.sleep(delay)
+        response = Response()
+        response.status_code = status
+        response.reason = reason
+        # 本文は展開済みで保存しているので、圧縮を示すヘッダーは外す
+        response.headers = CaseInsensitiveDict(
+            (name, value) for name, value in headers if name.lower() != "content-encoding"
+        )
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    HTTPAdapter.send = send
+
+def _patch_httpx(cassette):
+    """openai クライアントが使う httpx のトランスポートを差し替える"""
+    try:
+        import httpx
+    except ImportError:
+        return
+    original_handle = httpx.HTTPTransport.handle_request
+    original_handle_async = httpx.AsyncHTTPTransport.handle_async_request
+
+    def request_key(request):
+        return cassette.key(request.method, str(request.url), request.content, request.headers.get("content-type"))
+
+    def replayed_response(request, status, headers, body):
+        headers = [(name, value) for name, value in headers
+                   if name.lower() not in ("content-encoding", "transfer-encoding", "content-length")]
+        return httpx.Response(status, headers=headers, content=body, request=request)
+
+    def handle_request(self, request):
+        request.read()
+        key = request_key(request)
+        if cassette.mode == "record":
+            start = time.perf_counter()
+            response = original_handle(self, request)
+            body = response.read()
+            cassette.record(key, request.method, str(request.url), response.status_code, response.reason_phrase,
+                            list(response.headers.items()), body, time.perf_counter() - start)
+            return replayed_response(request, response.status_code, list(response.headers.items()), body)
+        status, _, headers, body, delay = cassette.play(key, request.method, str(request.url))
+        if delay:
+            time.sleep(delay)
+        return replayed_response(request, status, headers, body)
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        key = request_key(request)
+        if cassette.mode == "record":
+            start = time.perf_counter()
+            response = await original_handle_async(self, request)
+            body = await response.aread()
+            cassette.record(key, request.method, str(request.url), response.status_code, response.reason_phrase,
+                            list(response.headers.items()), body, time.perf_counter() - start)
+            return replayed_response(request, response.status_code, list(response.headers.items()), body)
+        status, _, headers, body, delay = cassette.play(key, request.method, str(request.url))
+        if delay:
+            await asyncio.sleep(delay)
+        return replayed_response(request, status, headers, body)
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+
+def _patch_urllib(cassette):
+    """標準ライブラリの urllib.request.urlopen を差し替える"""
+    import email.message
+    import io
+    import urllib.error
+    import urllib.request
+    import urllib.response
+    original_urlopen = urllib.request.urlopen
+
+    def build_headers(headers):
+        message = email.message.Message()
+        for name, value in headers:
+            message[name] = value
+        return message
+
+    def urlopen(url, data=None, timeout=None, **kwargs):
+        request = url if isinstance(url, urllib.request.Request) else urllib.request.Request(url, data)
+        method = request.get_method()
+        body = request.data if request.data is not None else data
+        key = cassette.key(method, request.full_url, body, request.get_header("Content-type"))
+        if cassette.mode == "record":
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            start = time.perf_counter()
+            try:
+                response = original_urlopen(request, **kwargs)
+            except urllib.error.HTTPError as e:
+                error_body = e.read()
+                cassette.record(key, method, request.full_url, e.code, e.reason, list(e.headers.items()),
+                                error_body, time.perf_counter() - start)
+                raise urllib.error.HTTPError(e.url, e.code, e.reason, e.headers, io.BytesIO(error_body))
+            content = response.read()
+            cassette.record(key, method, request.full_url, response.status, response.reason,
+                            list(response.headers.items()), content, time.perf_counter() - start)
+            return urllib.response.addinfourl(io.BytesIO(content), response.headers, request.full_url, response.status)
+
+        status, reason, headers, body, delay = cassette.play(key, method, request.full_url)
+        if delay:
+            time.sleep(delay)
+        headers = build_headers(headers)
+        if status >= 300:
+            raise urllib.error.HTTPError(request.full_url, status, reason, headers, io.BytesIO(body))
+        return urllib.response.addinfourl(io.BytesIO(body), headers, request.full_url, status)
+
+    urllib.request.urlopen = urlopen
+
+_installed = None
+
+def install_cassette(mode=None, directory=None, latency=None, latency_scale=None):
+    """
+    カセットを有効にする（mode が off なら何もしない）。同じプロセスで2回目以降は何もしない
+    directory は環境変数 CASSETTE_DIR が未設定のときに使うディレクトリ
+    有効にしたカセットを返す
+    """
+    global _installed
+    mode = mode or CASSETTE_MODE
+    if mode not in ("record", "replay"):
+        return None
+    if _installed is not None:
+        return _installed
+    cassette = Cassette(
+        CASSETTE_DIR or directory, mode,
+        latency=CASSETTE_LATENCY if latency is None else latency,
+        latency_scale=CASSETTE_LATENCY_SCALE if latency_scale is None else latency_scale,
+    )
+    _patch_requests(cassette)
+    _patch_httpx(cassette)
+    _patch_urllib(cassette)
+    _installed = cassette
+    logger.info(f"カセットを{'記録' if mode == 'record' else '再生'}モードで使用します: {cassette.directory}")
+    return cassette
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class FeedCache:
+    """
+    フィードURLごとに ETag / Last-Modified とパース済みエントリーを保存するディスクキャッシュ
+    304 Not Modified の場合はXMLを再パースせずに保存済みのエントリーを再利用する
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, feed_url):
+        key = hashlib.sha256(feed_url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, feed_url):
+        path = self._cache_path(feed_url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            logger.warning(f"フィードキャッシュが破損しています。再取得します: {feed_url}")
+            return None
+        if data.get('url') != feed_url:
+            return None
+        return data
+
+    def request_headers(self, feed_url):
+        """条件付きGET用のリクエストヘッダーを返す"""
+        data = self._load(feed_url)
+        headers = {}
+        if data:
+            if data.get('etag'):
+                headers['If-None-Match'] = data['etag']
+            if data.get('modified'):
+                headers['If-Modified-Since'] = data['modified']
+        return headers
+
+    def cached_feed(self, feed_url):
+        """保存済みのエントリーからフィードを復元する（パースは行わない）"""
+        data = self._load(feed_url)
+        if data is None:
+            return None
+        import feedparser
+        entries = [_restore_entry(entry) for entry in data.get('entries', [])]
+        return feedparser.FeedParserDict(entries=entries, status=304, href=feed_url)
+
+    def cached_links(self, feed_url):
+        """保存済みエントリーのリンクだけを返す（feedparser を読み込まない軽量版）"""
+        data = self._load(feed_url)
+        if data is None:
+            return None
+        return [entry.get('link') for entry in data.get('entries', [])]
+
+    def store(self, feed_url, feed, response_headers):
+        """取得したフィードとバリデーターを保存する"""
+        etag = response_headers.get('ETag')
+        modified = response_headers.get('Last-Modified')
+        if not etag and not modified:
+            # バリデーターがないフィードは条件付きGETできないので保存しない
+            return
+
+        data = {
+            'url': feed_url,
+            'etag': etag,
+            'modified': modified,
+            'entries': feed.entries,
+        }
+        path = self._cache_path(feed_url)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"フィードキャッシュの保存中にエラー: {e}")
+
+def _restore_entry(entry):
+    """JSONから読み込んだエントリーを feedparser と同じ形に戻す"""
+    import feedparser
+    restored = feedparser.FeedParserDict()
+    for key, value in entry.items():
+        # published_parsed などは time.struct_time に戻す
+        if key.endswith('_parsed') and isinstance(value, list):
+            value = time.struct_time(value)
+        elif isinstance(value, dict):
+            value = _restore_entry(value)
+        elif isinstance(value, list):
+            value = [_restore_entry(v) if isinstance(v, dict) else v for v in value]
+        restored[key] = value
+    return restored
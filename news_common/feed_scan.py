@@ -0,0 +1,66 @@
+"""
+標準ライブラリだけでフィードのエントリーのリンクを取り出す軽量スキャナー
+
+新着があるかどうかの判定だけに使う（feedparser / requests を読み込まない）
+判定できない場合は None を返すので、呼び出し側は通常の処理にフォールバックする
+"""
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+
+def _local_name(tag):
+    """'{名前空間}link' のような名前空間付きのタグ名から 'link' を取り出す"""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+def _entry_link(element):
+    """item / entry 要素から feedparser の entry.link と同じリンクを取り出す"""
+    fallback = None
+    for child in element:
+        if _local_name(child.tag) != 'link':
+            continue
+        # RSS は <link>URL</link>、Atom は <link rel="alternate" href="URL"/>
+        if child.text and child.text.strip():
+            return child.text.strip()
+        href = child.get('href')
+        if href:
+            if child.get('rel', 'alternate') == 'alternate':
+                return href.strip()
+            fallback = fallback or href.strip()
+    return fallback
+
+def scan_feed_links(content):
+    """
+    RSS 2.0 / RSS 1.0 / Atom のXMLからエントリーのリンクを順に返す
+    XMLとして読めない、またはリンクのないエントリーがある場合は None
+    """
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError:
+        return None
+
+    links = []
+    for element in root.iter():
+        if _local_name(element.tag) in ('item', 'entry'):
+            link = _entry_link(element)
+            if not link:
+                return None
+            links.append(link)
+    return links
+
+def fetch_feed_links(feed_url, cache=None, timeout=30):
+    """
+    フィードを条件付きGETし、エントリーのリンクのリストを返す
+    304 の場合は cache に保存済みのエントリーのリンクを返す
+    戻り値は (リンクのリスト または None, 取得に失敗したか)
+    """
+    headers = cache.request_headers(feed_url) if cache else {}
+    request = urllib.request.Request(feed_url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return scan_feed_links(response.read()), False
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cache:
+            return cache.cached_links(feed_url), False
+        return None, True
+    except (urllib.error.URLError, OSError):
+        return None, True
@@ -0,0 +1,375 @@
+"""
+LLM API 呼び出しの共通ラッパー（遅いリクエストでバッチ全体が止まらないようにする）
+
+- 1回の試行ごとのタイムアウトと、リトライを含めた全体の期限
+- ジッター付き指数バックオフでのリトライ（タイムアウト・接続エラー・429・5xx のみ）
+- ヘッジ: 応答がモデルの p95 より遅いとき、同じリクエストをもう1つ送り、早い方を使う（任意）
+- サーキットブレーカー: 連続で失敗したら一定時間 API を呼ばずにすぐ失敗させる
+- モデルごとのレイテンシのヒストグラム
+同期のクライアント用の call と、非同期のクライアント（AsyncOpenAI）用の acall がある
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# 1回の試行のタイムアウトと、リトライを含めた全体の期限（秒）
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "120"))
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "300"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+
+# ヘッジ（1 で有効）。p95 を計算できるだけの件数が集まるまでは行わない
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# 連続でこの回数失敗したら、LLM_BREAKER_COOLDOWN 秒は呼び出さずに失敗させる
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))
+
+# ヒストグラムのバケット（秒）
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+# パーセンタイル計算に使う直近の件数
+LATENCY_WINDOW = 500
+
+class LLMCallError(Exception):
+    """リトライしても LLM の呼び出しに成功しなかった"""
+
+class CircuitOpenError(LLMCallError):
+    """サーキットブレーカーが開いているため呼び出さなかった"""
+
+class LLMTimeoutError(LLMCallError):
+    """1回の試行がタイムアウトした"""
+
+def is_retryable(error):
+    """一時的な失敗（リトライする価値がある）かどうか"""
+    if isinstance(error, (LLMTimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # openai の例外は読み込まずに名前とステータスコードで判定する
+    if type(error).__name__ in ("APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+class LatencyHistogram:
+    """成功した呼び出しのレイテンシの累積ヒストグラムと、直近の値からのパーセンタイル"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def observe(self, seconds):
+        with self.lock:
+            self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.total += seconds
+            self.count += 1
+            self.recent.append(seconds)
+
+    def percentile(self, p):
+        with self.lock:
+            if not self.recent:
+                return None
+            values = sorted(self.recent)
+        return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+    def sample_count(self):
+        with self.lock:
+            return len(self.recent)
+
+    def as_dict(self):
+        with self.lock:
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], self.counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            data = {"count": self.count, "sum": round(self.total, 3), "buckets": buckets}
+        data["p50"] = self.percentile(50)
+        data["p95"] = self.percentile(95)
+        return data
+
+class CircuitBreaker:
+    """連続失敗で開き、クールダウン後に1件だけ試して閉じるか開き直すかを決める"""
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.probing:
+                return False
+            # クールダウンが過ぎたら試しに1件だけ通す
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release(self):
+        """API の状態が分からない結果（リクエスト自体の誤り）。試しに通した1件の枠だけを空ける"""
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.probing else "open"
+
+class LLMCaller:
+    """
+    モデルごとのヒストグラムとサーキットブレーカーを持つ呼び出しラッパー
+    call(func, model=..., ...) は func(model=..., ..., timeout=試行のタイムアウト) を実行する
+    （openai の create は timeout 引数でリクエストごとのタイムアウトを受け付ける）
+    """
+
+    def __init__(self, timeout=LLM_CALL_TIMEOUT, deadline=LLM_CALL_DEADLINE, max_retries=LLM_MAX_RETRIES,
+                 hedge=LLM_HEDGE, max_workers=16):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.breakers = {}
+        self.counters = {}
+        # 試行はこのスレッドで実行し、呼び出し側は期限までしか待たない
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-call")
+
+    def _get(self, table, model, factory):
+        with self.lock:
+            if model not in table:
+                table[model] = factory()
+            return table[model]
+
+    def histogram(self, model):
+        return self._get(self.histograms, model, LatencyHistogram)
+
+    def breaker(self, model):
+        return self._get(self.breakers, model, CircuitBreaker)
+
+    def _count(self, model, key):
+        with self.lock:
+            counters = self.counters.setdefault(model, {"calls": 0, "retries": 0, "hedges": 0, "failures": 0, "rejected": 0})
+            counters[key] += 1
+
+    def _hedge_delay(self, model):
+        histogram = self.histogram(model)
+        if not self.hedge or histogram.sample_count() < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return histogram.percentile(LLM_HEDGE_PERCENTILE)
+
+    def _attempt(self, func, model, timeout, kwargs):
+        """1回の試行（ヘッジ込み）。timeout 秒以内に終わらなければ LLMTimeoutError"""
+        start = time.monotonic()
+        futures = [self.executor.submit(func, model=model, timeout=timeout, **kwargs)]
+        hedge_delay = self._hedge_delay(model)
+        deadline = start + timeout
+        error = None
+        while futures:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wait_for = remaining
+            if hedge_delay is not None and len(futures) == 1 and not error:
+                wait_for = min(remaining, max(0.0, start + hedge_delay - time.monotonic()))
+            done, _ = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.remove(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self.histogram(model).observe(time.monotonic() - start)
+                return result
+            if not done and hedge_delay is not None and len(futures) == 1 and not error:
+                # p95 を過ぎても返ってこないので、同じリクエストをもう1つ送る
+                self._count(model, "hedges")
+                futures.append(self.executor.submit(func, model=model, timeout=timeout, **kwargs))
+                hedge_delay = None
+        if error is not None and not futures:
+            raise error
+        raise LLMTimeoutError(f"{model} の呼び出しが {timeout:.1f} 秒以内に終わりませんでした")
+
+    async def _aattempt(self, func, model, timeout, kwargs):
+        """非同期版の1回の試行（ヘッジ込み）。終わらなかった試行は取り消す"""
+        start = time.monotonic()
+        tasks = [asyncio.ensure_future(func(model=model, timeout=timeout, **kwargs))]
+        hedge_delay = self._hedge_delay(model)
+        deadline = start + timeout
+        error = None
+        try:
+            while tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait_for = remaining
+                if hedge_delay is not None and len(tasks) == 1 and not error:
+                    wait_for = min(remaining, max(0.0, start + hedge_delay - time.monotonic()))
+                done, _ = await asyncio.wait(tasks, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    self.histogram(model).observe(time.monotonic() - start)
+                    return result
+                if not done and hedge_delay is not None and len(tasks) == 1 and not error:
+                    self._count(model, "hedges")
+                    tasks.append(asyncio.ensure_future(func(model=model, timeout=timeout, **kwargs)))
+                    hedge_delay = None
+        finally:
+            # 期限切れ・ヘッジで負けた試行や、呼び出し側が取り消された場合の試行はリクエストごと取り消す
+            for task in tasks:
+                task.cancel()
+        if error is not None and not tasks:
+            raise error
+        raise LLMTimeoutError(f"{model} の呼び出しが {timeout:.1f} 秒以内に終わりませんでした")
+
+    def _check_breaker(self, model, breaker, attempt):
+        if not breaker.allow():
+            # 再試行の途中でブレーカーが開いた場合は、呼び出しの失敗として数える
+            self._count(model, "failures" if attempt else "rejected")
+            raise CircuitOpenError(f"{model} は直近の失敗が続いているため呼び出しを停止中です")
+
+    def _handle_failure(self, model, breaker, error, attempt, end):
+        """失敗した試行を記録し、再試行までの待ち時間（秒）を返す。再試行しない場合は例外を送出する"""
+        if not is_retryable(error):
+            # リクエスト自体の誤り（400など）は API の状態を表さないので、失敗にも成功にも数えない
+            breaker.release()
+            self._count(model, "failures")
+            raise error
+        breaker.record_failure()
+        backoff = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+        if attempt > self.max_retries or time.monotonic() + backoff >= end:
+            self._count(model, "failures")
+            raise LLMCallError(f"{model} の呼び出しに失敗しました（{attempt} 回試行）: {error}") from error
+        self._count(model, "retries")
+        logger.warning(f"{model} の呼び出しに失敗したため {backoff:.1f} 秒後に再試行します: {error}")
+        return backoff
+
+    def call(self, func, model, timeout=None, deadline=None, **kwargs):
+        """
+        func を期限・リトライ・ヘッジ・サーキットブレーカー付きで呼び出し、結果を返す
+        失敗した場合は LLMCallError（またはリトライしない例外そのもの）を送出する
+        """
+        timeout = timeout or self.timeout
+        end = time.monotonic() + (deadline or max(self.deadline, timeout))
+        breaker = self.breaker(model)
+        self._count(model, "calls")
+
+        attempt = 0
+        while True:
+            self._check_breaker(model, breaker, attempt)
+            attempt_timeout = min(timeout, end - time.monotonic())
+            try:
+                result = self._attempt(func, model, attempt_timeout, kwargs)
+            except Exception as e:
+                attempt += 1
+                time.sleep(self._handle_failure(model, breaker, e, attempt, end))
+                continue
+            breaker.record_success()
+            return result
+
+    async def acall(self, func, model, timeout=None, deadline=None, **kwargs):
+        """
+        call の非同期版。func はコルーチン関数（AsyncOpenAI のメソッドなど）
+        タイムアウトした試行や、acall 自体が取り消された場合は実行中のリクエストも取り消される
+        """
+        timeout = timeout or self.timeout
+        end = time.monotonic() + (deadline or max(self.deadline, timeout))
+        breaker = self.breaker(model)
+        self._count(model, "calls")
+
+        attempt = 0
+        while True:
+            self._check_breaker(model, breaker, attempt)
+            attempt_timeout = min(timeout, end - time.monotonic())
+            try:
+                result = await self._aattempt(func, model, attempt_timeout, kwargs)
+            except Exception as e:
+                attempt += 1
+                await asyncio.sleep(self._handle_failure(model, breaker, e, attempt, end))
+                continue
+            breaker.record_success()
+            return result
+
+    def metrics(self):
+        """モデルごとのヒストグラム・カウンター・ブレーカーの状態"""
+        with self.lock:
+            models = sorted(set(self.histograms) | set(self.counters))
+        return {
+            model: {
+                "latency": self.histogram(model).as_dict(),
+                "breaker": self.breaker(model).state,
+                **self.counters.get(model, {}),
+            }
+            for model in models
+        }
+
+    def report(self):
+        """実行の最後に表示する1モデル1行の要約"""
+        lines = []
+        for model, data in self.metrics().items():
+            latency = data["latency"]
+            p50 = f"{latency['p50']:.2f}s" if latency["p50"] is not None else "-"
+            p95 = f"{latency['p95']:.2f}s" if latency["p95"] is not None else "-"
+            lines.append(
+                f"{model}: 呼び出し {data.get('calls', 0)} 件, p50 {p50}, p95 {p95}, "
+                f"再試行 {data.get('retries', 0)}, ヘッジ {data.get('hedges', 0)}, 失敗 {data.get('failures', 0)}, "
+                f"遮断 {data.get('rejected', 0)}, "
+                f"ブレーカー {data['breaker']}"
+            )
+        return lines
+
+_caller = None
+_caller_lock = threading.Lock()
+
+def get_llm_caller():
+    """プロセス内で共有する呼び出しラッパー"""
+    global _caller
+    with _caller_lock:
+        if _caller is None:
+            _caller = LLMCaller()
+        return _caller
+
+def call_llm(func, model, **kwargs):
+    """共有ラッパーで func(model=model, **kwargs) を呼び出す"""
+    return get_llm_caller().call(func, model, **kwargs)
+
+async def acall_llm(func, model, **kwargs):
+    """共有ラッパーで await func(model=model, **kwargs) を呼び出す"""
+    return await get_llm_caller().acall(func, model, **kwargs)
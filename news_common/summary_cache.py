@@ -0,0 +1,99 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# キャッシュの上限（件数とバイト数）
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000"))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+def normalize_text(text):
+    """全角半角・空白の違いで別のキーにならないよう入力テキストを正規化"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return re.sub(r'\s+', ' ', text).strip()
+
+class SummaryCache:
+    """
+    要約結果の永続キャッシュ
+    キーは「正規化した入力テキスト + モデル + プロンプト」のハッシュなので、
+    URLが違っても同じ内容の記事なら同じ要約を再利用できる
+    上限を超えた場合は最後に使われた時刻が古いものから削除する（LRU）
+    """
+
+    def __init__(self, db_file, max_entries=SUMMARY_CACHE_MAX_ENTRIES, max_bytes=SUMMARY_CACHE_MAX_BYTES):
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS summaries (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_summaries_last_used ON summaries (last_used)')
+        self.conn.commit()
+        # 件数と合計サイズはメモリ上で管理し、保存のたびに集計しない
+        self.count, self.total_size = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries'
+        ).fetchone()
+
+    @staticmethod
+    def make_key(model, prompt, text):
+        payload = '\0'.join([model, normalize_text(prompt), normalize_text(text)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, model, prompt, text):
+        """キャッシュ済みの要約を返す（なければ None）"""
+        key = self.make_key(model, prompt, text)
+        with self.lock, self.conn:
+            row = self.conn.execute('SELECT summary FROM summaries WHERE cache_key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE summaries SET last_used = ? WHERE cache_key = ?', (time.time(), key))
+        return row[0]
+
+    def put(self, model, prompt, text, summary):
+        """要約を保存し、上限を超えていれば古いものから削除する"""
+        key = self.make_key(model, prompt, text)
+        size = len(summary.encode('utf-8'))
+        with self.lock, self.conn:
+            row = self.conn.execute('SELECT size FROM summaries WHERE cache_key = ?', (key,)).fetchone()
+            if row is not None:
+                self.count -= 1
+                self.total_size -= row[0]
+            self.conn.execute(
+                'INSERT OR REPLACE INTO summaries (cache_key, model, summary, size, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, model, summary, size, time.time())
+            )
+            self.count += 1
+            self.total_size += size
+            self._evict()
+
+    def _within_limits(self):
+        return self.count <= self.max_entries and self.total_size <= self.max_bytes
+
+    def _evict(self):
+        if self._within_limits():
+            return
+
+        # 最後に使われた時刻が古い順に、上限内に収まるまで削除
+        to_delete = []
+        for key, size in self.conn.execute('SELECT cache_key, size FROM summaries ORDER BY last_used'):
+            if self._within_limits():
+                break
+            to_delete.append((key,))
+            self.count -= 1
+            self.total_size -= size
+        self.conn.executemany('DELETE FROM summaries WHERE cache_key = ?', to_delete)
+
+    def close(self):
+        self.conn.close()
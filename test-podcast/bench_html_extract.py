@@ -0,0 +1,150 @@
+"""
+記事ページ・記事一覧ページの解析のベンチマーク
+従来の実装（BeautifulSoup で方法ごとに文書全体を探し直す）と html_extract の各バックエンドを比較する
+
+使い方: python bench_html_extract.py [HTMLファイルのディレクトリ] [繰り返し回数]
+ディレクトリを省略した場合はページキャッシュ（cache/page_cache.db）に保存済みのページを、
+それもなければ WordPress 風の合成ページを使う
+"""
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+import zlib
+
+from bs4 import BeautifulSoup
+
+from html_extract import BACKENDS, extract_article, extract_listing, get_backend
+
+def original_article(html):
+    """従来の実装（main_updated.parse_article_html の解析部分）"""
+    soup = BeautifulSoup(html, 'html.parser')
+    date_elem = soup.find(['time', 'span', 'div'], class_=lambda c: c and ('date' in c or 'time' in c or 'pub' in c))
+    pub_date = date_elem.get_text().strip() if date_elem else None
+    content = None
+    content_elem = soup.find('div', class_='entry-content')
+    if not content_elem:
+        content_elem = soup.find('article')
+    if not content_elem:
+        content_elem = soup.find('div', class_=lambda c: c and ('content' in c or 'body' in c))
+    if not content_elem:
+        main_elem = soup.find(['main', 'div'], id=lambda i: i and ('main' in i or 'content' in i))
+        if main_elem:
+            paragraphs = main_elem.find_all('p')
+            if paragraphs:
+                content = "\n".join([p.get_text().strip() for p in paragraphs])
+    if content_elem and not content:
+        for tag in content_elem.find_all(['script', 'style', 'aside', 'nav', 'footer']):
+            tag.decompose()
+        content = content_elem.get_text().strip()
+    if content:
+        return re.sub(r'\s+', ' ', content).strip(), pub_date
+    return None, None
+
+def original_listing(html, num_articles):
+    """従来の実装（main_updated.get_articles_from_website の解析部分）"""
+    soup = BeautifulSoup(html, 'html.parser')
+    article_elements = soup.find_all('article') or soup.find_all('div', class_=lambda c: c and ('post' in c or 'article' in c))
+    if not article_elements:
+        article_elements = soup.find_all(['div', 'section'], class_=lambda c: c and ('post' in c or 'article' in c or 'entry' in c))
+    articles = []
+    for article_elem in article_elements[:num_articles]:
+        title_elem = article_elem.find(['h1', 'h2', 'h3', 'h4']) or article_elem.find(class_=lambda c: c and ('title' in c))
+        if title_elem and title_elem.find('a'):
+            link_elem = title_elem.find('a')
+        else:
+            link_elem = article_elem.find('a', href=lambda h: h and not h.startswith('#'))
+        date_elem = article_elem.find(['time', 'span', 'div'], class_=lambda c: c and ('date' in c or 'time' in c or 'pub' in c))
+        if title_elem and link_elem:
+            date_str = date_elem.get_text().strip() if date_elem else "日付不明"
+            articles.append((title_elem.get_text().strip(), link_elem.get('href'), date_str))
+    return articles
+
+def load_directory(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    return pages
+
+def load_page_cache(db_file):
+    if not os.path.exists(db_file):
+        return []
+    conn = sqlite3.connect(db_file)
+    try:
+        return [zlib.decompress(body).decode("utf-8") for (body,) in conn.execute("SELECT body FROM pages")]
+    finally:
+        conn.close()
+
+def synthetic_page(rng, index):
+    """WordPress 風の記事ページ（ヘッダー・サイドバー・関連記事一覧つき）"""
+    paragraphs = "".join(
+        f"<p>{'本文のテキストです。' * rng.randint(5, 30)}<a href='/tag/{i}'>タグ{i}</a></p>" for i in range(rng.randint(8, 25))
+    )
+    related = "".join(
+        f"<article class='post related'><h3><a href='/p/{index}-{i}'>関連記事{i}</a></h3>"
+        f"<span class='post-date'>2026年10月{i + 1}日</span></article>" for i in range(6)
+    )
+    menu = "".join(f"<li class='menu-item'><a href='/c/{i}'>カテゴリー{i}</a></li>" for i in range(40))
+    return (
+        "<!DOCTYPE html><html><head><title>記事</title>"
+        + "<script>var config = {};</script><style>.x { color: red; }</style>" * 5
+        + f"</head><body><header id='masthead'><nav><ul>{menu}</ul></nav></header>"
+        f"<div id='content' class='site-content'><main id='main'>"
+        f"<article class='post-{index} post'><h1 class='entry-title'>記事{index}</h1>"
+        f"<time class='entry-date published'>2026年10月{index % 28 + 1}日</time>"
+        f"<div class='entry-content'>{paragraphs}<script>track();</script><aside>広告</aside></div>"
+        f"</article><section class='related-posts'>{related}</section></main>"
+        f"<aside id='secondary'><ul>{menu}</ul></aside></div>"
+        f"<footer id='colophon'>フッター</footer></body></html>"
+    )
+
+def timeit(func, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            func(page)
+    return time.perf_counter() - start
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else None
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    if directory:
+        pages, source = load_directory(directory), directory
+    else:
+        db_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "page_cache.db")
+        pages, source = load_page_cache(db_file), db_file
+    if not pages:
+        rng = random.Random(0)
+        pages, source = [synthetic_page(rng, i) for i in range(30)], "合成ページ"
+    total_kb = sum(len(page) for page in pages) / 1024
+    print(f"ページ: {len(pages)} 件 ({total_kb:.0f} KB, {source})  繰り返し: {repeat} 回")
+
+    expected_articles = [original_article(page) for page in pages]
+    expected_listings = [original_listing(page, 3) for page in pages]
+    base_article = timeit(original_article, pages, repeat)
+    base_listing = timeit(lambda page: original_listing(page, 3), pages, repeat)
+    per_page = repeat * len(pages)
+    print(f"{'従来の実装':<12}: 記事 {base_article / per_page * 1000:.2f} ms/件  一覧 {base_listing / per_page * 1000:.2f} ms/件")
+
+    for name in BACKENDS:
+        try:
+            backend = get_backend(name)
+        except ImportError:
+            print(f"{name:<12}: 未インストール")
+            continue
+        article_time = timeit(lambda page: extract_article(page, backend), pages, repeat)
+        listing_time = timeit(lambda page: extract_listing(page, 3, backend), pages, repeat)
+        # 従来の実装と抽出結果が一致するか（壊れたHTMLではパーサーによって木の形が変わることがある）
+        article_same = sum(extract_article(page, backend) == want for page, want in zip(pages, expected_articles))
+        listing_same = sum(extract_listing(page, 3, backend) == want for page, want in zip(pages, expected_listings))
+        print(f"{name:<12}: 記事 {article_time / per_page * 1000:.2f} ms/件 ({base_article / article_time:.1f} 倍)"
+              f"  一覧 {listing_time / per_page * 1000:.2f} ms/件 ({base_listing / listing_time:.1f} 倍)"
+              f"  一致 {article_same}/{len(pages)}, {listing_same}/{len(pages)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+記事ページ・記事一覧ページからの本文・リンクの抽出
+
+selectolax または lxml があればそれを使い、なければ BeautifulSoup（html.parser）で解析する
+（どちらも任意の依存。HTML_EXTRACT_BACKEND=auto|selectolax|lxml|bs4 で固定もできる）
+- 候補になりうる要素（日付・entry-content・article・content/body の div・main）を
+  1回の走査でまとめて集め、優先順位に従って選ぶ（方法ごとに文書全体を探し直さない）
+- selectolax / lxml では候補の検索を CSS セレクター / XPath で C の中で行う
+- BeautifulSoup では候補の要素とその中身だけを木にする（SoupStrainer）
+"""
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+HTML_EXTRACT_BACKEND = os.getenv("HTML_EXTRACT_BACKEND", "auto")
+
+DATE_TAGS = ("time", "span", "div")
+DATE_KEYS = ("date", "time", "pub")
+HEADING_TAGS = ("h1", "h2", "h3", "h4")
+# 本文から取り除く要素
+STRIP_TAGS = ("script", "style", "aside", "nav", "footer")
+# テキストとして扱わない要素
+TEXTLESS_TAGS = ("script", "style", "template")
+
+def _article_slots(tag, cls, element_id):
+    """記事ページの候補要素が、どの方法の候補になるかを返す"""
+    slots = []
+    if tag in DATE_TAGS and any(key in cls for key in DATE_KEYS):
+        slots.append("date")
+    if tag == "div" and "entry-content" in cls.split():
+        slots.append("entry")
+    if tag == "article":
+        slots.append("article")
+    if tag == "div" and ("content" in cls or "body" in cls):
+        slots.append("content")
+    if tag in ("main", "div") and ("main" in element_id or "content" in element_id):
+        slots.append("main")
+    return slots
+
+def _listing_slots(tag, cls):
+    """記事一覧ページの候補要素が、どの探し方の候補になるかを返す"""
+    slots = []
+    if tag == "article":
+        slots.append("article")
+    if tag == "div" and ("post" in cls or "article" in cls):
+        slots.append("post")
+    if tag in ("div", "section") and ("post" in cls or "article" in cls or "entry" in cls):
+        slots.append("entry")
+    return slots
+
+def _is_article_candidate(tag, attrs):
+    return bool(_article_slots(tag, attrs.get("class") or "", attrs.get("id") or ""))
+
+def _is_listing_candidate(tag, attrs):
+    return bool(_listing_slots(tag, attrs.get("class") or ""))
+
+class _SelectolaxBackend:
+    name = "selectolax"
+
+    # 候補をまとめて探すセレクター（結果は文書の順）
+    ARTICLE_SELECTOR = ", ".join(
+        [f'{tag}[class*="{key}"]' for tag in DATE_TAGS for key in DATE_KEYS]
+        + ["article", 'div[class*="content"]', 'div[class*="body"]']
+        + [f'{tag}[id*="{key}"]' for tag in ("main", "div") for key in ("main", "content")]
+    )
+    LISTING_SELECTOR = ", ".join(
+        ["article"] + [f'{tag}[class*="{key}"]' for tag in ("div", "section") for key in ("post", "article", "entry")]
+    )
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.parser = LexborHTMLParser
+
+    def article_candidates(self, html):
+        return self.parser(html).css(self.ARTICLE_SELECTOR)
+
+    def listing_candidates(self, html):
+        return self.parser(html).css(self.LISTING_SELECTOR)
+
+    def tag(self, node):
+        return node.tag
+
+    def attr(self, node, name):
+        return node.attributes.get(name) or ""
+
+    def descendants(self, node):
+        nodes = node.traverse()
+        next(nodes, None)  # 自分自身は含めない
+        return (child for child in nodes if child.is_element_node)
+
+    def text(self, node):
+        # BeautifulSoup の get_text と同じく script / style の中身は含めない
+        return "".join(
+            child.text_content or "" for child in node.traverse(include_text=True)
+            if child.tag == "-text" and child.parent.tag not in TEXTLESS_TAGS
+        )
+
+    def drop(self, node, tags):
+        for child in node.css(", ".join(tags)):
+            child.decompose()
+
+class _LxmlBackend:
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+        self.html = lxml.html
+        self.parser_error = etree.ParserError
+        contains_any = lambda attr, keys: " or ".join(f"contains(@{attr},'{key}')" for key in keys)
+        self.article_xpath = etree.XPath(
+            f"//*[self::time or self::span or self::div][{contains_any('class', DATE_KEYS)}]"
+            f" | //article"
+            f" | //div[{contains_any('class', ('content', 'body'))}]"
+            f" | //*[self::main or self::div][{contains_any('id', ('main', 'content'))}]"
+        )
+        self.listing_xpath = etree.XPath(
+            f"//article | //*[self::div or self::section][{contains_any('class', ('post', 'article', 'entry'))}]"
+        )
+
+    def _parse(self, html):
+        """文書を解析する（空・空白やコメントだけの文書は、他のバックエンドと同じく要素なしとして None）"""
+        try:
+            try:
+                return self.html.document_fromstring(html)
+            except ValueError:
+                # XML宣言でエンコーディングが指定された文字列は、バイト列にして読み込む
+                return self.html.document_fromstring(html.encode("utf-8"))
+        except self.parser_error:
+            return None
+
+    def article_candidates(self, html):
+        document = self._parse(html)
+        return [] if document is None else self.article_xpath(document)
+
+    def listing_candidates(self, html):
+        document = self._parse(html)
+        return [] if document is None else self.listing_xpath(document)
+
+    def tag(self, node):
+        return node.tag if isinstance(node.tag, str) else ""
+
+    def attr(self, node, name):
+        return node.get(name) or ""
+
+    def descendants(self, node):
+        return (child for child in node.iterdescendants() if isinstance(child.tag, str))
+
+    def text(self, node):
+        # BeautifulSoup の get_text と同じく script / style の中身は含めない（後ろのテキストは含める）
+        parts = [] if node.tag in TEXTLESS_TAGS else [node.text or ""]
+        for child in node.iterdescendants():
+            if isinstance(child.tag, str) and child.tag not in TEXTLESS_TAGS and child.getparent().tag not in TEXTLESS_TAGS:
+                parts.append(child.text or "")
+            parts.append(child.tail or "")
+        return "".join(parts)
+
+    def drop(self, node, tags):
+        for child in list(node.iterdescendants(*tags)):
+            # 要素の後ろに続くテキストは残す
+            child.drop_tree()
+
+class _Bs4Backend:
+    name = "bs4"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup, SoupStrainer
+        self.soup = BeautifulSoup
+        self.article_strainer = SoupStrainer(lambda tag, attrs=None: _matches(_is_article_candidate, tag, attrs))
+        self.listing_strainer = SoupStrainer(lambda tag, attrs=None: _matches(_is_listing_candidate, tag, attrs))
+
+    def article_candidates(self, html):
+        soup = self.soup(html, "html.parser", parse_only=self.article_strainer)
+        return soup.find_all(lambda tag: _is_article_candidate(tag.name, _bs4_attrs(tag)))
+
+    def listing_candidates(self, html):
+        soup = self.soup(html, "html.parser", parse_only=self.listing_strainer)
+        return soup.find_all(lambda tag: _is_listing_candidate(tag.name, _bs4_attrs(tag)))
+
+    def tag(self, node):
+        return node.name
+
+    def attr(self, node, name):
+        value = node.get(name)
+        return " ".join(value) if isinstance(value, list) else (value or "")
+
+    def descendants(self, node):
+        return node.find_all(True)
+
+    def text(self, node):
+        return node.get_text()
+
+    def drop(self, node, tags):
+        for child in node.find_all(list(tags)):
+            child.decompose()
+
+def _bs4_attrs(tag):
+    return {name: " ".join(value) if isinstance(value, list) else value for name, value in tag.attrs.items()}
+
+def _matches(predicate, tag, attrs):
+    """SoupStrainer からは (タグ名, 属性) か Tag が渡される"""
+    if attrs is None and hasattr(tag, "name"):
+        return predicate(tag.name, _bs4_attrs(tag))
+    return predicate(tag, attrs or {})
+
+BACKENDS = {"selectolax": _SelectolaxBackend, "lxml": _LxmlBackend, "bs4": _Bs4Backend}
+
+_backends = {}
+
+def get_backend(name=None):
+    """使える中で最も速いバックエンド（name を指定した場合はそれ）を返す"""
+    name = name or HTML_EXTRACT_BACKEND
+    names = list(BACKENDS) if name == "auto" else [name]
+    for candidate in names:
+        if candidate in _backends:
+            return _backends[candidate]
+        try:
+            backend = BACKENDS[candidate]()
+        except ImportError:
+            continue
+        _backends[candidate] = backend
+        return backend
+    raise ImportError(f"HTMLの解析に使えるライブラリがありません: {name}")
+
+def extract_article(html, backend=None):
+    """
+    記事ページのHTMLから (本文, 公開日) を返す（本文が見つからない場合は (None, None)）
+    本文は entry-content の div → article → class に content/body を含む div →
+    id に main/content を含む main/div の中の段落 の順に探す
+    """
+    backend = backend or get_backend()
+    first = {}
+    for node in backend.article_candidates(html):
+        for slot in _article_slots(backend.tag(node), backend.attr(node, "class"), backend.attr(node, "id")):
+            first.setdefault(slot, node)
+
+    pub_date = backend.text(first["date"]).strip() if "date" in first else None
+
+    content = None
+    # lxml の要素は子がないと偽になるので、or ではなく見つかったかどうかで選ぶ
+    content_elem = next((first[slot] for slot in ("entry", "article", "content") if slot in first), None)
+    if content_elem is None and "main" in first:
+        # main要素内の段落をすべて取得
+        paragraphs = [node for node in backend.descendants(first["main"]) if backend.tag(node) == "p"]
+        if paragraphs:
+            content = "\n".join(backend.text(p).strip() for p in paragraphs)
+
+    if content_elem is not None and not content:
+        backend.drop(content_elem, STRIP_TAGS)
+        content = backend.text(content_elem).strip()
+
+    if not content:
+        return None, None
+    # テキストの正規化（余分な空白の削除など）
+    return re.sub(r'\s+', ' ', content).strip(), pub_date
+
+def extract_listing(html, num_articles, backend=None):
+    """
+    記事一覧ページのHTMLから、先頭 num_articles 件の記事の (タイトル, リンク, 日付) を返す
+    記事の要素は article → class に post/article を含む div →
+    class に post/article/entry を含む div/section の順に探す（リンクは href のまま）
+    """
+    backend = backend or get_backend()
+    found = {"article": [], "post": [], "entry": []}
+    for node in backend.listing_candidates(html):
+        for slot in _listing_slots(backend.tag(node), backend.attr(node, "class")):
+            found[slot].append(node)
+    article_elements = found["article"] or found["post"] or found["entry"]
+    logger.info(f"記事候補数: {len(article_elements)}")
+
+    articles = []
+    for article_elem in article_elements[:num_articles]:
+        # タイトル・リンク・日付になる最初の要素を1回の走査で探す
+        heading = title_class = link = date_elem = None
+        for node in backend.descendants(article_elem):
+            tag = backend.tag(node)
+            if heading is None and tag in HEADING_TAGS:
+                heading = node
+            if title_class is None and "title" in backend.attr(node, "class"):
+                title_class = node
+            if link is None and tag == "a":
+                href = backend.attr(node, "href")
+                if href and not href.startswith("#"):
+                    link = node
+            if date_elem is None and tag in DATE_TAGS and any(key in backend.attr(node, "class") for key in DATE_KEYS):
+                date_elem = node
+        title_elem = heading if heading is not None else title_class
+
+        # タイトルの中にリンクがあればそれを使う
+        if title_elem is not None:
+            title_link = next((node for node in backend.descendants(title_elem) if backend.tag(node) == "a"), None)
+            if title_link is not None:
+                link = title_link
+
+        if title_elem is not None and link is not None:
+            date_str = backend.text(date_elem).strip() if date_elem is not None else "日付不明"
+            articles.append((backend.text(title_elem).strip(), backend.attr(link, "href") or None, date_str))
+    return articles
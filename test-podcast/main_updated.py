@@ -1,17 +1,25 @@
 import asyncio
-import feedparser
-import requests
-from bs4 import BeautifulSoup
 import os
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
 import logging
 import re
 import subprocess
 import shutil
+import threading
+import shared
+from news_common.feed_cache import FeedCache
+from news_common.summary_cache import SummaryCache
+from page_cache import PageCache, PAGE_CACHE_LISTING_TTL
+from html_extract import extract_article, extract_listing
+from news_common.feed_scan import fetch_feed_links
+from news_common.llm_call import acall_llm, get_llm_caller
+from news_common.cassette import install_cassette
+
+# feedparser / requests / bs4 / openai は読み込みが重いので、使う関数の中で読み込む
+# （新着がない日は読み込まずに終了できるようにするため）
 
 # ロギング設定
 logging.basicConfig(
@@ -32,6 +40,9 @@ SCRIPTS_DIR = BASE_DIR / "scripts"
 OUTPUT_DIR = BASE_DIR / "output"
 SUMMARY_DIR = OUTPUT_DIR / "要約"
 TEMP_DIR = BASE_DIR / "temp"
+FEED_CACHE_DIR = BASE_DIR / "cache" / "feeds"
+SUMMARY_CACHE_FILE = BASE_DIR / "cache" / "summary_cache.db"
+PAGE_CACHE_FILE = BASE_DIR / "cache" / "page_cache.db"
 
 # 過去に使用した記事の記録ファイル
 USED_ARTICLES_FILE = BASE_DIR / "used_articles.json"
@@ -49,6 +60,21 @@ PODCAST_PROMPT = """あなたはプロのPodcastの話し手です。 上記の
 ・出力内容を検証し、同じ名用を言っていないか検証すること。同じであれば独自に検索して内容を付け足して、同じ言い回しや内容はできるだけ使いまわさず、実のある内容にして 
 ・出力内容は一度精査し、内容にうそや矛盾がないことを検証すること"""
 
+# 要約用のモデルとプロンプト
+SUMMARY_MODEL = "o3-mini"
+SUMMARY_SYSTEM_PROMPT = "あなたは優れた要約者です。文章を200文字以内に要約してください。セキュリティに関する具体的なトピック、企業名、脆弱性の種類、重要なポイントを盛り込んだ内容にしてください。"
+SUMMARY_USER_PROMPT = "次のセキュリティポッドキャストの台本について:\n1. 登場する企業名や組織名を必ず含める\n2. 具体的な脆弱性の種類や攻撃手法を含める\n3. 合計200文字以内で要約する\n\n台本内容:\n"
+
+# 記事ページの取得の同時実行数・タイムアウト（秒）と、HTML解析のワーカー数
+ARTICLE_FETCH_CONCURRENCY = int(os.getenv("ARTICLE_FETCH_CONCURRENCY", "4"))
+ARTICLE_FETCH_TIMEOUT = float(os.getenv("ARTICLE_FETCH_TIMEOUT", "20"))
+ARTICLE_PARSE_WORKERS = int(os.getenv("ARTICLE_PARSE_WORKERS", "2"))
+
+# 台本生成は出力が長いので、1回の試行のタイムアウトを長めにする（秒）
+SCRIPT_CALL_TIMEOUT = float(os.getenv("SCRIPT_CALL_TIMEOUT", "300"))
+# 音声合成（TTS）の1回の試行のタイムアウト（秒）
+TTS_CALL_TIMEOUT = float(os.getenv("TTS_CALL_TIMEOUT", "300"))
+
 # 固定のあいさつ
 OPENING_GREETING = "こんにちは、皆さん。ようこそ、私はホストの大江です。"
 CLOSING_MESSAGE = "今後もこうしたニュースの背景や影響について、皆さんと一緒に考えていきたいと思います。もしこのエピソードについてご意見や質問がありましたら、ぜひお寄せください。また、ポッドキャストを楽しんでいただけたなら、評価やレビューもお願いします。それでは、次回もお楽しみに。ありがとうございました。"
@@ -124,65 +150,72 @@ def filter_unused_articles(articles):
     return unused_articles
 
 def fetch_rss_feed(url):
-    """RSSフィードを取得する"""
+    """RSSフィードを取得する（ETag/Last-Modifiedによる条件付きGET）"""
+    import feedparser
+    import requests
     try:
-        feed = feedparser.parse(url)
+        cache = FeedCache(FEED_CACHE_DIR)
+        response = requests.get(url, headers=cache.request_headers(url), timeout=30)
+        if response.status_code == 304:
+            feed = cache.cached_feed(url)
+            if feed is not None:
+                logger.info(f"RSS未更新のためキャッシュを使用: {len(feed.entries)}件のエントリ")
+                return feed
+            response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        
+        feed = feedparser.parse(response.content, response_headers=dict(response.headers))
+        cache.store(url, feed, response.headers)
         logger.info(f"RSS取得成功: {len(feed.entries)}件のエントリを検出")
         return feed
     except Exception as e:
         logger.error(f"RSSフィード取得エラー: {e}")
         return None
 
+def has_unused_feed_articles(url):
+    """
+    高速判定: RSSのエントリーのリンクを使用済み記事の記録と照合し、
+    未使用の記事がありそうなら True を返す（feedparser / openai を読み込まない）
+    RSSを取得・判定できない場合は通常の処理（Webサイトからの取得）に任せるため True
+    """
+    links, failed = fetch_feed_links(url, FeedCache(FEED_CACHE_DIR), timeout=30)
+    if failed or links is None:
+        return True
+    used_urls = set(load_used_articles()["urls"])
+    return any(link not in used_urls for link in links)
+
+def has_unused_articles():
+    """
+    高速判定: 通常の処理で記事を探す RSS と Webサイトの記事一覧の両方を照合し、
+    未使用の記事がありそうなら True を返す（openai を読み込まない）
+    RSSの記事がすべて使用済みでも、通常の処理はWebサイトから記事を探すので同じように確認する
+    （一覧ページはページキャッシュの有効期限内なら通信しない）
+    """
+    if has_unused_feed_articles(RSS_URL):
+        return True
+    return bool(filter_unused_articles(get_articles_from_website(SITE_URL, num_articles=10)))
+
 def get_articles_from_website(site_url, num_articles=3):
     """Webサイトから直接記事を取得する"""
+    import requests
     try:
         logger.info(f"Webサイトから記事を取得しています: {site_url}")
-        response = requests.get(site_url)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
+        with requests.Session() as session:
+            html = get_page_cache().fetch(session, site_url, ARTICLE_FETCH_TIMEOUT, ttl=PAGE_CACHE_LISTING_TTL)
         
         # 記事リストを探す (サイト構造によって調整が必要)
         articles = []
         
-        # 様々な記事コンテナの可能性を試す
-        article_elements = soup.find_all('article') or soup.find_all('div', class_=lambda c: c and ('post' in c or 'article' in c))
-        
-        if not article_elements:
-            # より一般的な方法で記事を探してみる
-            article_elements = soup.find_all(['div', 'section'], class_=lambda c: c and ('post' in c or 'article' in c or 'entry' in c))
-        
-        logger.info(f"記事候補数: {len(article_elements)}")
-        
-        for article_elem in article_elements[:num_articles]:
-            # タイトルを探す
-            title_elem = article_elem.find(['h1', 'h2', 'h3', 'h4']) or article_elem.find(class_=lambda c: c and ('title' in c))
+        for title, link, date_str in extract_listing(html, num_articles):
+            # 相対URLを絶対URLに変換
+            if link and not link.startswith(('http://', 'https://')):
+                link = f"https://rocket-boys.co.jp{link}" if not link.startswith('/') else f"https://rocket-boys.co.jp{link}"
             
-            # リンクを探す
-            link_elem = None
-            if title_elem and title_elem.find('a'):
-                link_elem = title_elem.find('a')
-            else:
-                link_elem = article_elem.find('a', href=lambda h: h and not h.startswith('#'))
-            
-            # 日付を探す
-            date_elem = article_elem.find(['time', 'span', 'div'], class_=lambda c: c and ('date' in c or 'time' in c or 'pub' in c))
-            
-            if title_elem and link_elem:
-                title = title_elem.get_text().strip()
-                link = link_elem.get('href')
-                
-                # 相対URLを絶対URLに変換
-                if link and not link.startswith(('http://', 'https://')):
-                    link = f"https://rocket-boys.co.jp{link}" if not link.startswith('/') else f"https://rocket-boys.co.jp{link}"
-                
-                date_str = date_elem.get_text().strip() if date_elem else "日付不明"
-                
-                articles.append({
-                    "title": title,
-                    "link": link,
-                    "date": date_str
-                })
+            articles.append({
+                "title": title,
+                "link": link,
+                "date": date_str
+            })
         
         logger.info(f"取得した記事数: {len(articles)}")
         return articles
@@ -191,69 +224,87 @@ def get_articles_from_website(site_url, num_articles=3):
         logger.error(f"記事取得エラー: {e}")
         return []
 
-def extract_article_content(url):
-    """記事の本文を抽出する"""
-    try:
-        logger.info(f"記事内容を取得しています: {url}")
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # ページから公開日を抽出してみる
-        date_elem = soup.find(['time', 'span', 'div'], class_=lambda c: c and ('date' in c or 'time' in c or 'pub' in c))
-        pub_date = date_elem.get_text().strip() if date_elem else None
-        
-        # 記事本文を探す方法を複数試す
-        content = None
-        
-        # 方法1: entry-content クラス
-        content_elem = soup.find('div', class_='entry-content')
-        
-        # 方法2: article タグ
-        if not content_elem:
-            content_elem = soup.find('article')
-        
-        # 方法3: コンテンツらしきdivを探す
-        if not content_elem:
-            content_elem = soup.find('div', class_=lambda c: c and ('content' in c or 'body' in c))
-        
-        # 方法4: メインコンテンツっぽい場所
-        if not content_elem:
-            main_elem = soup.find(['main', 'div'], id=lambda i: i and ('main' in i or 'content' in i))
-            if main_elem:
-                # main要素内の段落をすべて取得
-                paragraphs = main_elem.find_all('p')
-                if paragraphs:
-                    content = "\n".join([p.get_text().strip() for p in paragraphs])
-        
-        if content_elem and not content:
-            # 不要なタグを削除
-            for tag in content_elem.find_all(['script', 'style', 'aside', 'nav', 'footer']):
-                tag.decompose()
-            
-            content = content_elem.get_text().strip()
-        
-        if content:
-            # テキストの正規化（余分な空白の削除など）
-            content = re.sub(r'\s+', ' ', content).strip()
-            logger.info(f"記事内容取得成功: {len(content)} 文字")
-            return content, pub_date
-        else:
-            logger.warning(f"記事本文が見つかりませんでした: {url}")
-            return None, None
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+def get_page_cache():
+    """記事ページ・一覧ページのキャッシュ（プロセス内で共有）"""
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            PAGE_CACHE_FILE.parent.mkdir(exist_ok=True, parents=True)
+            _page_cache = PageCache(str(PAGE_CACHE_FILE))
+        return _page_cache
+
+def create_http_session(pool_size=ARTICLE_FETCH_CONCURRENCY):
+    """コネクションプールを共有するHTTPセッションを作成する"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_article_html(session, url, timeout=ARTICLE_FETCH_TIMEOUT):
+    """記事ページのHTMLを取得する（取得済みのページはキャッシュから返す）"""
+    logger.info(f"記事内容を取得しています: {url}")
+    return get_page_cache().fetch(session, url, timeout)
+
+def parse_article_html(html, url):
+    """記事ページのHTMLから (本文, 公開日) を抽出する（見つからなければ (None, None)）"""
+    content, pub_date = extract_article(html)
+    if content:
+        logger.info(f"記事内容取得成功: {len(content)} 文字")
+        return content, pub_date
+    else:
+        logger.warning(f"記事本文が見つかりませんでした: {url}")
+        return None, None
+
+async def extract_article_contents(articles, concurrency=ARTICLE_FETCH_CONCURRENCY):
+    """
+    記事ページを同時に最大 concurrency 件まで取得し、記事と同じ順で (本文, 公開日) のリストを返す
+    取得は共有セッションでスレッドから行い、HTMLの解析は別のワーカースレッドで行うので、
+    どちらの間もイベントループは止まらない
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    session = create_http_session(concurrency)
+    fetch_executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="article-fetch")
+    parse_executor = ThreadPoolExecutor(max_workers=ARTICLE_PARSE_WORKERS, thread_name_prefix="article-parse")
     
-    except Exception as e:
-        logger.error(f"記事内容取得エラー: {url} - {e}")
+    async def extract(url):
+        try:
+            async with semaphore:
+                # requests のタイムアウトは読み込みの間隔ごとなので、1件全体の上限も設ける
+                html = await asyncio.wait_for(
+                    loop.run_in_executor(fetch_executor, fetch_article_html, session, url),
+                    timeout=ARTICLE_FETCH_TIMEOUT * 2,
+                )
+            return await loop.run_in_executor(parse_executor, parse_article_html, html, url)
+        except asyncio.TimeoutError:
+            logger.error(f"記事内容取得エラー: {url} - {ARTICLE_FETCH_TIMEOUT * 2:.0f} 秒以内に取得できませんでした")
+        except Exception as e:
+            logger.error(f"記事内容取得エラー: {url} - {e}")
         return None, None
+    
+    try:
+        return await asyncio.gather(*(extract(article["link"]) for article in articles))
+    finally:
+        # 期限切れで残った取得スレッドの終了は待たない（イベントループを止めないため）
+        fetch_executor.shutdown(wait=False, cancel_futures=True)
+        parse_executor.shutdown(wait=False)
+        session.close()
 
 async def generate_podcast_script(articles, client):
     """記事からPodcastスクリプトを生成する"""
     # 記事内容を集約
     all_contents = []
     
-    for article in articles:
-        content, pub_date = extract_article_content(article["link"])
+    # 記事ページは並行して取得し、全件そろったらすぐ台本の生成に進む
+    extracted = await extract_article_contents(articles)
+    for article, (content, pub_date) in zip(articles, extracted):
         if content:
             all_contents.append({
                 "title": article["title"],
@@ -280,8 +331,12 @@ async def generate_podcast_script(articles, client):
     
     try:
         # OpenAI APIを使用して台本を生成
-        response = client.chat.completions.create(
-            model="o3-mini",  # ここでモデルをo3-miniに指定
+        # 期限・リトライ・サーキットブレーカー付きで呼び出す
+        response = await acall_llm(
+            client.chat.completions.create,
+            "o3-mini",  # ここでモデルをo3-miniに指定
+            timeout=SCRIPT_CALL_TIMEOUT,
+            deadline=SCRIPT_CALL_TIMEOUT * 2,
             messages=[
                 {"role": "system", "content": "あなたはプロのPodcastの話し手で、セキュリティトピックに詳しいです。"},
                 {"role": "user", "content": input_text}
@@ -301,23 +356,85 @@ async def generate_podcast_script(articles, client):
         logger.error(f"スクリプト生成エラー: {e}")
         return None
 
-async def generate_audio(script, client):
-    """スクリプトからオーディオファイルを生成する"""
+def save_script(script, timestamp):
+    """スクリプトをテキストファイルとして保存し、そのパスを返す"""
+    script_path = SCRIPTS_DIR / f"script_{timestamp}.txt"
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write(script)
+    
+    logger.info(f"スクリプト保存: {script_path}")
+    return script_path
+
+def mix_with_bgm(temp_voice_path, output_path):
+    """音声にBGMをミックスして output_path に保存する（ffmpeg を実行するので時間がかかる）"""
+    # BGMとミックス
+    if os.path.exists(BGM_FILE):
+        logger.info(f"BGMとミックスしています: {BGM_FILE}")
+        try:
+            # FFmpegを使用してBGMと音声をミックス
+            # 参照コードのようにpython-ffmpegライブラリを使用してみます
+            try:
+                import ffmpeg
+                
+                voice = ffmpeg.input(str(temp_voice_path))
+                bgm = ffmpeg.input(BGM_FILE)
+                mixed = ffmpeg.filter([voice, bgm], 'amix', inputs=2, duration='first', weights='1 0.1')
+                
+                # 音量正規化とバランス調整
+                normalized = ffmpeg.filter(mixed, 'dynaudnorm')
+                
+                ffmpeg.output(normalized, str(output_path), **{
+                    'c:a': 'libmp3lame',
+                    'q:a': 4
+                }).overwrite_output().run()
+                
+                logger.info(f"python-ffmpegでBGMミックス完了: {output_path}")
+            
+            except ImportError:
+                # ffmpegライブラリが使用できない場合は、コマンドライン実行にフォールバック
+                logger.warning("python-ffmpegモジュールが見つからないため、コマンドラインで実行します")
+                
+                cmd = [
+                    'ffmpeg', '-y',
+                    '-i', str(temp_voice_path),
+                    '-i', BGM_FILE,
+                    '-filter_complex', 
+                    # 音声を優先し、BGMのボリュームを下げる
+                    '[1:a]volume=0.1[bgm];[0:a][bgm]amix=inputs=2:duration=first:weights=1 0.6',
+                    '-c:a', 'libmp3lame', '-q:a', '4',
+                    str(output_path)
+                ]
+                
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                if result.returncode != 0:
+                    logger.error(f"FFmpegエラー: {result.stderr}")
+                    # ミックスに失敗した場合は、ミックスなしのファイルを使用
+                    shutil.copy2(temp_voice_path, output_path)
+                    logger.warning(f"BGMミックス失敗のため、ミックスなしのファイルを使用します")
+                else:
+                    logger.info(f"BGMミックス完了: {output_path}")
+        except Exception as e:
+            logger.error(f"BGMミックスエラー: {e}")
+            # ミックスに失敗した場合は、ミックスなしのファイルを使用
+            shutil.copy2(temp_voice_path, output_path)
+            logger.warning(f"BGMミックス失敗のため、ミックスなしのファイルを使用します")
+    else:
+        # BGMファイルが存在しない場合は、ミックスなしのファイルを使用
+        logger.warning(f"BGMファイルが見つかりません: {BGM_FILE}")
+        shutil.copy2(temp_voice_path, output_path)
+        logger.info(f"音声ファイルをコピーしました: {output_path}")
+
+async def generate_audio(script, client, timestamp):
+    """スクリプトからオーディオファイルを生成し、そのパスを返す（失敗したら None）"""
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         temp_voice_path = TEMP_DIR / f"voice_{timestamp}.mp3"
         output_path = OUTPUT_DIR / f"podcast_{timestamp}.mp3"
         
-        # スクリプトをテキストファイルとして保存
-        script_path = SCRIPTS_DIR / f"script_{timestamp}.txt"
-        with open(script_path, 'w', encoding='utf-8') as f:
-            f.write(script)
-        
-        logger.info(f"スクリプト保存: {script_path}")
-        
-        # TTSで音声生成
-        response = client.audio.speech.create(
-            model="tts-1",
+        # TTSで音声生成（期限・リトライ・サーキットブレーカー付き）
+        response = await acall_llm(
+            client.audio.speech.create,
+            "tts-1",
+            timeout=TTS_CALL_TIMEOUT,
             voice="shimmer",
             input=script
         )
@@ -328,73 +445,19 @@ async def generate_audio(script, client):
         
         logger.info(f"音声生成完了: {temp_voice_path}")
         
-        # BGMとミックス
-        if os.path.exists(BGM_FILE):
-            logger.info(f"BGMとミックスしています: {BGM_FILE}")
-            try:
-                # FFmpegを使用してBGMと音声をミックス
-                # 参照コードのようにpython-ffmpegライブラリを使用してみます
-                try:
-                    import ffmpeg
-                    
-                    voice = ffmpeg.input(str(temp_voice_path))
-                    bgm = ffmpeg.input(BGM_FILE)
-                    mixed = ffmpeg.filter([voice, bgm], 'amix', inputs=2, duration='first', weights='1 0.1')
-                    
-                    # 音量正規化とバランス調整
-                    normalized = ffmpeg.filter(mixed, 'dynaudnorm')
-                    
-                    ffmpeg.output(normalized, str(output_path), **{
-                        'c:a': 'libmp3lame',
-                        'q:a': 4
-                    }).overwrite_output().run()
-                    
-                    logger.info(f"python-ffmpegでBGMミックス完了: {output_path}")
-                    
-                except ImportError:
-                    # ffmpegライブラリが使用できない場合は、コマンドライン実行にフォールバック
-                    logger.warning("python-ffmpegモジュールが見つからないため、コマンドラインで実行します")
-                    
-                    cmd = [
-                        'ffmpeg', '-y',
-                        '-i', str(temp_voice_path),
-                        '-i', BGM_FILE,
-                        '-filter_complex', 
-                        # 音声を優先し、BGMのボリュームを下げる
-                        '[1:a]volume=0.1[bgm];[0:a][bgm]amix=inputs=2:duration=first:weights=1 0.6',
-                        '-c:a', 'libmp3lame', '-q:a', '4',
-                        str(output_path)
-                    ]
-                
-                    result = subprocess.run(cmd, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        logger.error(f"FFmpegエラー: {result.stderr}")
-                        # ミックスに失敗した場合は、ミックスなしのファイルを使用
-                        shutil.copy2(temp_voice_path, output_path)
-                        logger.warning(f"BGMミックス失敗のため、ミックスなしのファイルを使用します")
-                    else:
-                        logger.info(f"BGMミックス完了: {output_path}")
-            except Exception as e:
-                logger.error(f"BGMミックスエラー: {e}")
-                # ミックスに失敗した場合は、ミックスなしのファイルを使用
-                shutil.copy2(temp_voice_path, output_path)
-                logger.warning(f"BGMミックス失敗のため、ミックスなしのファイルを使用します")
-        else:
-            # BGMファイルが存在しない場合は、ミックスなしのファイルを使用
-            logger.warning(f"BGMファイルが見つかりません: {BGM_FILE}")
-            shutil.copy2(temp_voice_path, output_path)
-            logger.info(f"音声ファイルをコピーしました: {output_path}")
+        # BGMとのミックスは別スレッドで行い、その間も要約の生成などを進める
+        await asyncio.to_thread(mix_with_bgm, temp_voice_path, output_path)
         
         # 一時ファイルの削除
         if os.path.exists(temp_voice_path):
             os.remove(temp_voice_path)
             logger.info(f"一時ファイルを削除しました: {temp_voice_path}")
         
-        return str(output_path), str(script_path)
+        return str(output_path)
     
     except Exception as e:
         logger.error(f"音声生成エラー: {e}")
-        return None, None
+        return None
 
 async def generate_summary(script_path, client):
     """スクリプトの内容を要約する"""
@@ -419,19 +482,29 @@ async def generate_summary(script_path, client):
         
         logger.info(f"要約を生成しています: {script_path}")
         
-        # OpenAI APIを使用して要約を生成
+        # OpenAI APIを使用して要約を生成（同じ台本の要約はキャッシュから再利用）
         try:
-            response = client.chat.completions.create(
-                model="o3-mini",
-                messages=[
-                    {"role": "system", "content": "あなたは優れた要約者です。文章を200文字以内に要約してください。セキュリティに関する具体的なトピック、企業名、脆弱性の種類、重要なポイントを盛り込んだ内容にしてください。"},
-                    {"role": "user", "content": f"次のセキュリティポッドキャストの台本について:\n1. 登場する企業名や組織名を必ず含める\n2. 具体的な脆弱性の種類や攻撃手法を含める\n3. 合計200文字以内で要約する\n\n台本内容:\n{script_content}"}
-                ],
-                max_completion_tokens=300
-            )
+            SUMMARY_CACHE_FILE.parent.mkdir(exist_ok=True, parents=True)
+            summary_cache = SummaryCache(str(SUMMARY_CACHE_FILE))
+            summary = summary_cache.get(SUMMARY_MODEL, SUMMARY_SYSTEM_PROMPT + SUMMARY_USER_PROMPT, script_content)
             
-            logger.info("APIから要約を取得しました")
-            summary = response.choices[0].message.content
+            if summary is not None:
+                logger.info("要約キャッシュから要約を取得しました")
+            else:
+                response = await acall_llm(
+                    client.chat.completions.create,
+                    SUMMARY_MODEL,
+                    messages=[
+                        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                        {"role": "user", "content": f"{SUMMARY_USER_PROMPT}{script_content}"}
+                    ],
+                    max_completion_tokens=300
+                )
+                
+                logger.info("APIから要約を取得しました")
+                summary = response.choices[0].message.content
+                if summary and summary.strip():
+                    summary_cache.put(SUMMARY_MODEL, SUMMARY_SYSTEM_PROMPT + SUMMARY_USER_PROMPT, script_content, summary)
             logger.info(f"要約内容: {summary}")  # 要約内容をログに出力
             
             # 要約が明らかに不十分な場合のみチェックと再生成を行う
@@ -670,113 +743,137 @@ async def main():
             logger.error("OPENAI_API_KEY環境変数が設定されていません")
             return
         
-        # OpenAIクライアントの初期化
-        client = OpenAI(api_key=api_key)
+        # CASSETTE_MODE=record|replay なら通信を記録・再生する（オフラインでの計測用）
+        install_cassette(directory=shared.CASSETTE_DIR)
         
         # コマンドライン引数でスクリプトだけの処理を行うかチェック
         import sys
         generate_summary_only = '--summary-only' in sys.argv
         
-        if generate_summary_only:
-            logger.info("要約生成のみのモードで実行します")
-            # scriptsディレクトリから最新のスクリプトを取得
-            script_files = list(SCRIPTS_DIR.glob('*.txt'))
-            if not script_files:
-                logger.error("scriptsディレクトリにスクリプトファイルが見つかりません")
-                return
-            
-            # 最新のファイルを使用
-            latest_script = max(script_files, key=os.path.getmtime)
-            logger.info(f"最新のスクリプトファイルを使用します: {latest_script}")
-            
-            # 要約のみ生成
-            summary_path = await generate_summary(str(latest_script), client)
-            if summary_path:
-                logger.info(f"要約生成完了: {summary_path}")
-            else:
-                logger.warning("要約の生成に失敗しました")
-            
+        # RSS・Webサイトの記事がすべて使用済みなら、OpenAI を読み込む前に終了する
+        if not generate_summary_only and '--no-fast-path' not in sys.argv and not has_unused_articles():
+            logger.info("RSS・Webサイトに未使用の記事がないため終了します（高速判定）")
             return
         
-        # 通常の処理（記事取得から始める）
-        articles = []
+        # OpenAIクライアントの初期化（非同期クライアントを1つだけ作り、全段階で共有する）
+        from openai import AsyncOpenAI
+        # 再試行・バックオフ・サーキットブレーカーは llm_call に任せるので、SDK では再試行しない
+        async with AsyncOpenAI(api_key=api_key, max_retries=0) as client:
+            await run_pipeline(client, generate_summary_only)
         
-        # 方法1: RSSフィードから取得
-        feed = fetch_rss_feed(RSS_URL)
-        if feed and feed.entries:
-            # 記事情報を取得
-            all_articles = [{
-                "title": entry.title,
-                "link": entry.link,
-                "date": datetime(*entry.published_parsed[:6]).strftime('%Y-%m-%d') if hasattr(entry, 'published_parsed') else "日付不明"
-            } for entry in feed.entries]  # 全ての記事を取得
-            
-            # 昨日の記事だけをフィルタリング
-            target_date = get_yesterday_date()
-            filtered_articles = filter_articles_by_date(all_articles, target_date)
-            
-            # 過去に使用していない記事だけを取得
-            articles = filter_unused_articles(filtered_articles)
-            
-            # 昨日の記事がないか、既に使用済みの記事しかない場合は、フィルターを緩和する
-            if not articles:
-                logger.warning(f"昨日 ({target_date}) の未使用記事が見つかりません。直近の記事を使用します")
-                # 最新で未使用の記事を最大5件取得
-                unused_articles = filter_unused_articles(all_articles)
-                articles = unused_articles[:5]
-        
-        # 方法2: Webサイトから直接記事を取得
-        if not articles:
-            logger.info("RSSからの取得に失敗したため、Webサイトから記事を取得します")
-            website_articles = get_articles_from_website(SITE_URL, num_articles=10)  # 最大5件で3件→上限を多めに設定
-            
-            # 過去に使用していない記事だけをフィルタリング
-            unused_website_articles = filter_unused_articles(website_articles)
-            articles = unused_website_articles[:5]  # 最大5件使用
-        
-        if not articles:
-            logger.error("使用可能な記事が見つかりませんでした")
-            return
-        
-        # 使用する記事の最終確認
-        if len(articles) > 3:
-            # 記事数が多い場合は3件に絞る
-            logger.info(f"{len(articles)}件の記事が見つかりましたが、3件に絞ります")
-            articles = articles[:3]
-        
-        # 使用する記事情報を記録
-        logger.info(f"スクリプト生成に使用する記事数: {len(articles)}")
-        for i, article in enumerate(articles):
-            logger.info(f"  {i+1}. {article['title']} ({article['date']})")
-        
-        # Podcastスクリプトの生成
-        script = await generate_podcast_script(articles, client)
-        if not script:
-            logger.error("スクリプトの生成に失敗しました")
+    except Exception as e:
+        logger.error(f"処理中にエラーが発生しました: {e}")
+
+async def run_pipeline(client, generate_summary_only=False):
+    """記事の取得から台本・音声・要約の生成までを行う（client は共有の AsyncOpenAI）"""
+    if generate_summary_only:
+        logger.info("要約生成のみのモードで実行します")
+        # scriptsディレクトリから最新のスクリプトを取得
+        script_files = list(SCRIPTS_DIR.glob('*.txt'))
+        if not script_files:
+            logger.error("scriptsディレクトリにスクリプトファイルが見つかりません")
             return
         
-        # 音声ファイルの生成
-        audio_path, script_path = await generate_audio(script, client)
-        if not audio_path or not script_path:
-            logger.error("音声ファイルの生成に失敗しました")
-            return
-            
-        logger.info(f"ポッドキャスト生成完了: {audio_path}")
+        # 最新のファイルを使用
+        latest_script = max(script_files, key=os.path.getmtime)
+        logger.info(f"最新のスクリプトファイルを使用します: {latest_script}")
         
-        # 要約の生成
-        summary_path = await generate_summary(script_path, client)
+        # 要約のみ生成
+        summary_path = await generate_summary(str(latest_script), client)
         if summary_path:
             logger.info(f"要約生成完了: {summary_path}")
         else:
             logger.warning("要約の生成に失敗しました")
         
-        # 使用した記事を保存
-        save_used_articles(articles)
+        return
+    
+    # 通常の処理（記事取得から始める）
+    articles = []
+    
+    # 方法1: RSSフィードから取得
+    feed = await asyncio.to_thread(fetch_rss_feed, RSS_URL)
+    if feed and feed.entries:
+        # 記事情報を取得
+        all_articles = [{
+            "title": entry.title,
+            "link": entry.link,
+            "date": datetime(*entry.published_parsed[:6]).strftime('%Y-%m-%d') if hasattr(entry, 'published_parsed') else "日付不明"
+        } for entry in feed.entries]  # 全ての記事を取得
+        
+        # 昨日の記事だけをフィルタリング
+        target_date = get_yesterday_date()
+        filtered_articles = filter_articles_by_date(all_articles, target_date)
         
-        logger.info("全処理完了")
+        # 過去に使用していない記事だけを取得
+        articles = filter_unused_articles(filtered_articles)
         
-    except Exception as e:
-        logger.error(f"処理中にエラーが発生しました: {e}")
+        # 昨日の記事がないか、既に使用済みの記事しかない場合は、フィルターを緩和する
+        if not articles:
+            logger.warning(f"昨日 ({target_date}) の未使用記事が見つかりません。直近の記事を使用します")
+            # 最新で未使用の記事を最大5件取得
+            unused_articles = filter_unused_articles(all_articles)
+            articles = unused_articles[:5]
+    
+    # 方法2: Webサイトから直接記事を取得
+    if not articles:
+        logger.info("RSSからの取得に失敗したため、Webサイトから記事を取得します")
+        website_articles = await asyncio.to_thread(get_articles_from_website, SITE_URL, num_articles=10)  # 最大5件で3件→上限を多めに設定
+        
+        # 過去に使用していない記事だけをフィルタリング
+        unused_website_articles = filter_unused_articles(website_articles)
+        articles = unused_website_articles[:5]  # 最大5件使用
+    
+    if not articles:
+        logger.error("使用可能な記事が見つかりませんでした")
+        return
+    
+    # 使用する記事の最終確認
+    if len(articles) > 3:
+        # 記事数が多い場合は3件に絞る
+        logger.info(f"{len(articles)}件の記事が見つかりましたが、3件に絞ります")
+        articles = articles[:3]
+    
+    # 使用する記事情報を記録
+    logger.info(f"スクリプト生成に使用する記事数: {len(articles)}")
+    for i, article in enumerate(articles):
+        logger.info(f"  {i+1}. {article['title']} ({article['date']})")
+    
+    # Podcastスクリプトの生成
+    script = await generate_podcast_script(articles, client)
+    if not script:
+        logger.error("スクリプトの生成に失敗しました")
+        return
+    
+    # スクリプトを保存し、音声ファイルの生成（TTS・BGMミックス）と要約の生成を並行して行う
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    script_path = save_script(script, timestamp)
+    audio_task = asyncio.create_task(generate_audio(script, client, timestamp))
+    summary_task = asyncio.create_task(generate_summary(str(script_path), client))
+    try:
+        audio_path = await audio_task
+        if not audio_path:
+            logger.error("音声ファイルの生成に失敗しました")
+            return
+        
+        logger.info(f"ポッドキャスト生成完了: {audio_path}")
+        summary_path = await summary_task
+    finally:
+        # 音声の生成に失敗した・取り消された場合は、生成中の要約も取り消す
+        summary_task.cancel()
+    
+    if summary_path:
+        logger.info(f"要約生成完了: {summary_path}")
+    else:
+        logger.warning("要約の生成に失敗しました")
+    
+    # 使用した記事を保存
+    save_used_articles(articles)
+    
+    for line in get_llm_caller().report():
+        logger.info(f"LLM呼び出し: {line}")
+    if _page_cache is not None:
+        logger.info(_page_cache.report())
+    logger.info("全処理完了")
 
 if __name__ == "__main__":
     asyncio.run(main())
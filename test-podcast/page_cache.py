@@ -0,0 +1,142 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# 取得してからこの秒数以内のページはネットワークに問い合わせずに使う
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", str(24 * 60 * 60)))
+# 記事一覧ページは更新されやすいので短めにする
+PAGE_CACHE_LISTING_TTL = float(os.getenv("PAGE_CACHE_LISTING_TTL", str(6 * 60 * 60)))
+# キャッシュの上限（圧縮後のバイト数）
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+class PageCache:
+    """
+    記事ページ・一覧ページのHTMLを圧縮して保存するHTTPキャッシュ
+    - TTL 以内ならネットワークに問い合わせずに保存済みのHTMLを返す
+    - TTL を過ぎたら ETag / Last-Modified で条件付きGETを行い、304なら保存済みのHTMLを使う
+    - 取得に失敗した場合は、古くても保存済みのHTMLがあればそれを返す
+    - 合計サイズが上限を超えたら、最後に使われた時刻が古いものから削除する（LRU）
+    """
+
+    def __init__(self, db_file, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                modified TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_last_used ON pages (last_used)')
+        self.conn.commit()
+        self.total_size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        # 実行中の内訳（キャッシュから返した / 再検証で304 / 取得した / 失敗して古いものを返した）
+        self.stats = {"hit": 0, "revalidated": 0, "fetched": 0, "stale": 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _load(self, url):
+        with self.lock:
+            return self.conn.execute(
+                'SELECT etag, modified, body, fetched_at FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+
+    def _touch(self, url, fetched_at=None):
+        now = time.time()
+        with self.lock, self.conn:
+            if fetched_at is None:
+                self.conn.execute('UPDATE pages SET last_used = ? WHERE url = ?', (now, url))
+            else:
+                self.conn.execute('UPDATE pages SET last_used = ?, fetched_at = ? WHERE url = ?', (now, fetched_at, url))
+
+    def store(self, url, text, response_headers):
+        """取得したHTMLとバリデーターを圧縮して保存し、上限を超えていれば古いものから削除する"""
+        if 'no-store' in (response_headers.get('Cache-Control') or ''):
+            return
+        body = zlib.compress(text.encode('utf-8'), 6)
+        size = len(body)
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute('SELECT size FROM pages WHERE url = ?', (url,)).fetchone()
+            if row is not None:
+                self.total_size -= row[0]
+            self.conn.execute(
+                'INSERT OR REPLACE INTO pages (url, etag, modified, body, size, fetched_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, response_headers.get('ETag'), response_headers.get('Last-Modified'), body, size, now, now)
+            )
+            self.total_size += size
+            self._evict()
+
+    def _evict(self):
+        if self.total_size <= self.max_bytes:
+            return
+
+        # 最後に使われた時刻が古い順に、上限内に収まるまで削除
+        to_delete = []
+        for url, size in self.conn.execute('SELECT url, size FROM pages ORDER BY last_used'):
+            if self.total_size <= self.max_bytes:
+                break
+            to_delete.append((url,))
+            self.total_size -= size
+        self.conn.executemany('DELETE FROM pages WHERE url = ?', to_delete)
+
+    def fetch(self, session, url, timeout, ttl=PAGE_CACHE_TTL):
+        """
+        キャッシュを使って url のHTMLを返す（session は requests.Session）
+        取得できず保存済みのHTMLもない場合は例外を送出する
+        """
+        row = self._load(url)
+        if row is not None and time.time() - row[3] < ttl:
+            self._count("hit")
+            self._touch(url)
+            logger.info(f"ページキャッシュを使用: {url}")
+            return zlib.decompress(row[2]).decode('utf-8')
+
+        headers = {}
+        if row is not None:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and row is not None:
+                self._count("revalidated")
+                self._touch(url, fetched_at=time.time())
+                logger.info(f"ページ未更新のためキャッシュを使用: {url}")
+                return zlib.decompress(row[2]).decode('utf-8')
+            response.raise_for_status()
+        except Exception as e:
+            if row is None:
+                raise
+            self._count("stale")
+            logger.warning(f"ページの取得に失敗したため古いキャッシュを使用: {url} - {e}")
+            return zlib.decompress(row[2]).decode('utf-8')
+
+        self._count("fetched")
+        self.store(url, response.text, response.headers)
+        return response.text
+
+    def report(self):
+        with self.lock:
+            return (f"ページキャッシュ: キャッシュ {self.stats['hit']} 件, 再検証 {self.stats['revalidated']} 件, "
+                    f"取得 {self.stats['fetched']} 件, 失敗時の再利用 {self.stats['stale']} 件")
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,14 @@
+"""
+リポジトリ直下の共通モジュール（news_common）を読み込めるようにする
+news_common のモジュールより先に import する（ログはルートロガーの設定に従って出力される）
+"""
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(PROJECT_DIR)
+# 通信の記録（CASSETTE_MODE=record|replay）の既定の保存先
+CASSETTE_DIR = os.path.join(PROJECT_DIR, "cassettes")
+
+if REPOSITORY_DIR not in sys.path:
+    sys.path.append(REPOSITORY_DIR)